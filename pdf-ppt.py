@@ -1,12 +1,15 @@
 import os
 import sys
+import multiprocessing
 import win32com.client
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QFileDialog,
-    QMessageBox, QListWidget, QHBoxLayout, QComboBox, QAction, QMenu,QListWidgetItem
+    QMessageBox, QListWidget, QHBoxLayout, QComboBox, QAction, QMenu,QListWidgetItem, QProgressBar
 )
-from PyQt5.QtCore import Qt
-from PyPDF2 import PdfReader, PdfWriter
+from PyQt5.QtCore import Qt, QTimer
+from pdf_merge_thread import MergeThread, update_source_items, invalid_sources
+from pdf_merge_core import SourceInspector
+from pdf_trim_progress import format_progress
 
 
 class OfficeToPDFConverter(QWidget):
@@ -42,6 +45,11 @@ class OfficeToPDFConverter(QWidget):
 
         self.btn_add_pdf = QPushButton("添加 PDF 文件")
         self.btn_merge_pdf = QPushButton("合并 PDF")
+        self.btn_cancel_merge = QPushButton("取消合并")
+        self.btn_cancel_merge.setEnabled(False)
+        self.merge_progress_bar = QProgressBar()
+        self.merge_progress_bar.setValue(0)
+        self.merge_status_label = QLabel("就绪")
 
         merge_layout = QVBoxLayout()
         merge_layout.addWidget(QLabel("【PDF 合并器】"))
@@ -51,6 +59,9 @@ class OfficeToPDFConverter(QWidget):
         merge_layout.addWidget(self.file_list)
         merge_layout.addWidget(self.btn_add_pdf)
         merge_layout.addWidget(self.btn_merge_pdf)
+        merge_layout.addWidget(self.btn_cancel_merge)
+        merge_layout.addWidget(self.merge_progress_bar)
+        merge_layout.addWidget(self.merge_status_label)
 
         # --- 快捷键支持 ---
         from PyQt5.QtWidgets import QShortcut
@@ -72,6 +83,20 @@ class OfficeToPDFConverter(QWidget):
 
         self.btn_add_pdf.clicked.connect(self.add_pdfs)
         self.btn_merge_pdf.clicked.connect(self.merge_pdfs)
+        self.btn_cancel_merge.clicked.connect(self.cancel_merge)
+
+        # 合并在后台线程中进行，每秒刷新 10 次进度
+        self.merge_thread = None
+        self.current_file = ""
+        self.merge_timer = QTimer(self)
+        self.merge_timer.setInterval(100)
+        self.merge_timer.timeout.connect(self.update_merge_progress)
+
+        # 添加文件后在进程池中预先读取页数与书签
+        self.inspector = SourceInspector()
+        self.inspect_timer = QTimer(self)
+        self.inspect_timer.setInterval(100)
+        self.inspect_timer.timeout.connect(self.update_source_info)
 
     # ================== Word/PPT 转换逻辑 ==================
     def select_folder(self):
@@ -165,88 +190,114 @@ class OfficeToPDFConverter(QWidget):
         self.file_list.clear()
         for file in sorted_files:
             item = QListWidgetItem()
-            item.setText(os.path.basename(file))
             item.setData(Qt.UserRole, file)
             item.setToolTip(file)
             self.file_list.addItem(item)
 
+        self.inspector.submit(sorted_files)
+        update_source_items(self.file_list, self.inspector)
+        self.inspect_timer.start()
+
+    def update_source_info(self):
+        if self.inspector.poll():
+            update_source_items(self.file_list, self.inspector)
+        if not self.inspector.busy:
+            self.inspect_timer.stop()
+
     def merge_pdfs(self):
         if self.file_list.count() == 0:
             QMessageBox.warning(self, "错误", "请先添加至少一个 PDF 文件。")
             return
 
+        self.update_source_info()
+        invalid = invalid_sources(self.file_list, self.inspector)
+        if invalid:
+            QMessageBox.warning(self, "错误", "以下文件无法合并，请先移除：\n" + "\n".join(invalid))
+            return
+
         output_path, _ = QFileDialog.getSaveFileName(self, "保存合并后的 PDF", "", "PDF 文件 (*.pdf)")
         if not output_path:
             return
 
-        try:
-            pdf_writer = PdfWriter()
-            current_page = 0
-            bookmarks = []
-
-            for i in range(self.file_list.count()):
-                item = self.file_list.item(i)
-                pdf_path = item.data(Qt.UserRole)
-                reader = PdfReader(pdf_path)
-
-                outlines = reader.outline if reader.outline else []
-                bookmarks.append({
-                    'filename': item.text(),
-                    'pages': len(reader.pages),
-                    'outline': outlines
-                })
-
-                for page in reader.pages:
-                    pdf_writer.add_page(page)
-
-                bookmarks[-1]['start_page'] = current_page
-                current_page += len(reader.pages)
-
-            current_page = 0
-            for bm in bookmarks:
-                filename = bm['filename']
-                start_page = bm['start_page']
-
-                top_level = pdf_writer.add_outline_item(filename, start_page)
-                self.add_outline(pdf_writer, bm['outline'], parent=top_level, offset=current_page)
-                current_page += bm['pages']
-
-            with open(output_path, "wb") as output_file:
-                pdf_writer.write(output_file)
-
-            msg_box = QMessageBox(self)
-            msg_box.setIcon(QMessageBox.Information)
-            msg_box.setWindowTitle("完成")
-            msg_box.setText(f"PDF 已成功合并到：\n{output_path}")
-            open_button = msg_box.addButton("打开文件所在位置", QMessageBox.ActionRole)
-            ok_button = msg_box.addButton(QMessageBox.Ok)
-            msg_box.exec_()
-
-            if msg_box.clickedButton() == open_button:
-                self.open_file_location(output_path)
+        sources = []
+        for i in range(self.file_list.count()):
+            file = self.file_list.item(i).data(Qt.UserRole)
+            sources.append((file, os.path.basename(file)))
+
+        self.set_merging(True)
+        self.merge_status_label.setText("合并中...")
+        self.merge_progress_bar.setValue(0)
+        self.merge_thread = MergeThread(sources, output_path, dict(self.inspector.infos))
+        self.merge_thread.file_started.connect(self.on_merge_file_started)
+        self.merge_thread.task_completed.connect(self.on_merge_completed)
+        self.merge_thread.start()
+        self.merge_timer.start()
+
+    def set_merging(self, merging):
+        self.btn_add_pdf.setEnabled(not merging)
+        self.btn_merge_pdf.setEnabled(not merging)
+        self.file_list.setEnabled(not merging)
+        self.btn_cancel_merge.setEnabled(merging)
+
+    def cancel_merge(self):
+        if self.merge_thread is not None and self.merge_thread.isRunning():
+            self.merge_thread.cancel()
+            self.btn_cancel_merge.setEnabled(False)
+            self.merge_status_label.setText("正在取消...")
+
+    def on_merge_file_started(self, index, count, pdf_path):
+        self.current_file = f"第 {index + 1}/{count} 个文件：{os.path.basename(pdf_path)}"
+
+    def update_merge_progress(self):
+        if self.merge_thread is None or self.merge_thread.cancel_event.is_set():
+            return
+        snapshot = self.merge_thread.progress.snapshot()
+        if not snapshot.total:
+            self.merge_status_label.setText(f"读取{self.current_file}")
+        elif snapshot.done < snapshot.total:
+            self.merge_progress_bar.setValue(snapshot.percent)
+            self.merge_status_label.setText(f"添加页面... {format_progress(snapshot)}（{self.current_file}）")
+        else:
+            self.merge_progress_bar.setValue(100)
+            self.merge_status_label.setText("写入文件...")
+
+    def on_merge_completed(self, success, message):
+        self.merge_timer.stop()
+        # 信号在 run() 返回前发出，等线程结束后再释放
+        self.merge_thread.wait()
+        output_path = self.merge_thread.output_path
+        cancelled = self.merge_thread.cancel_event.is_set()
+        self.merge_thread = None
+        self.set_merging(False)
+
+        if not success:
+            self.merge_progress_bar.setValue(0)
+            self.merge_status_label.setText("合并未完成")
+            if cancelled:
+                QMessageBox.information(self, "已取消", message)
+            else:
+                QMessageBox.critical(self, "错误", message)
+            return
 
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"合并过程中出错：{str(e)}")
-
-    def add_outline(self, writer, outline, parent=None, offset=0):
-        if isinstance(outline, list):
-            for item in outline:
-                self.add_outline(writer, item, parent, offset)
-        elif hasattr(outline, 'dest'):
-            dest = outline.dest
-            page_number = writer.get_destination_page_number(dest) + offset
-            writer.add_outline_item(outline.title, page_number, parent=parent)
-        elif hasattr(outline, '__dict__'):
-            title = getattr(outline, 'title', 'Untitled')
-            try:
-                page_ref = getattr(outline, 'page_reference', None)
-                if page_ref:
-                    page_number = writer.page_references.index(page_ref) + offset
-                    writer.add_outline_item(title, page_number, parent=parent)
-                else:
-                    pass
-            except Exception:
-                pass
+        self.merge_status_label.setText("合并完成")
+        msg_box = QMessageBox(self)
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.setWindowTitle("完成")
+        msg_box.setText(message)
+        open_button = msg_box.addButton("打开文件所在位置", QMessageBox.ActionRole)
+        ok_button = msg_box.addButton(QMessageBox.Ok)
+        msg_box.exec_()
+
+        if msg_box.clickedButton() == open_button:
+            self.open_file_location(output_path)
+
+    def closeEvent(self, event):
+        if self.merge_thread is not None and self.merge_thread.isRunning():
+            self.merge_thread.cancel()
+            self.merge_thread.wait()
+        self.inspect_timer.stop()
+        self.inspector.shutdown()
+        super().closeEvent(event)
 
     def open_file_location(self, file_path):
         directory = os.path.dirname(file_path)
@@ -265,6 +316,7 @@ class OfficeToPDFConverter(QWidget):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = OfficeToPDFConverter()
     window.show()
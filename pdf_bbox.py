@@ -0,0 +1,353 @@
+"""基于像素缓冲区的内容边界检测
+
+直接读取 pixmap 的 samples 缓冲区计算“有墨迹”的行/列投影，
+避免逐像素调用 pix.pixel(x, y)。安装了 numpy 时使用零拷贝视图做向量化归约，
+否则退回按整行 bytes 扫描的纯 Python 实现。两种实现与原先逐像素判断
+`(r + g + b) // 3 < 255 * (1 - threshold)` 的结果完全一致；
+单通道灰度图直接比较灰度值。
+
+扫描方式 scan：
+    full  —— 一次性计算整幅图像的行/列投影；
+    edges —— 从四条边向内逐块扫描，遇到内容立即停止，
+             工作量与白边面积成正比，适合内容占满大部分页面的情况。
+两种扫描方式的结果相同。
+
+抗噪参数（扫描件上的灰尘、污点）：
+    min_density —— 一行（列）中内容像素所占比例不低于该值才算作有内容；
+                   列的比例按上下边界之间的行数计算；
+    min_run     —— 至少连续 min_run 行（列）有内容才算作内容的边界。
+启用任一参数时总是按行/列的内容像素数投影一次性计算，不使用 edges 逐块扫描。
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # 没有 numpy 时使用纯 Python 实现
+    np = None
+
+SCAN_FULL = "full"
+SCAN_EDGES = "edges"
+SCAN_MODES = (SCAN_FULL, SCAN_EDGES)
+
+# 从边缘向内扫描时首块的行/列数，之后每块翻倍
+EDGE_BLOCK = 8
+
+
+def ink_limit(threshold):
+    """返回整数灰度上限 c：灰度值 < c 即视为内容
+
+    原判断条件为 gray < 255 * (1 - threshold)，gray 为整数，
+    因此等价于 gray < ceil(255 * (1 - threshold))。
+    """
+    limit = math.ceil(255 * (1 - threshold))
+    return min(max(limit, 0), 256)
+
+
+def _samples_view(pix):
+    """尽量以零拷贝方式取得 pixmap 的像素缓冲区"""
+    samples = getattr(pix, "samples_mv", None)
+    if samples is None:
+        samples = pix.samples
+    return samples
+
+
+def _pixel_view(pix):
+    """把 pixmap 缓冲区视为 (height, width, n) 的 uint8 数组"""
+    width, height, n = pix.width, pix.height, pix.n
+    stride = getattr(pix, "stride", width * n)
+    buf = np.frombuffer(_samples_view(pix), dtype=np.uint8)
+    img = buf[:height * stride].reshape(height, stride)[:, :width * n]
+    return img.reshape(height, width, n)
+
+
+def _ink_mask(img, limit):
+    """计算每个像素是否为内容"""
+    if img.shape[2] >= 3:
+        # (r + g + b) // 3 < c  等价于  r + g + b < 3c
+        total = img[:, :, 0].astype(np.uint16)
+        total += img[:, :, 1]
+        total += img[:, :, 2]
+        return total < 3 * limit
+    return img[:, :, 0] < limit
+
+
+def _find_ink_bbox_numpy(pix, limit):
+    height, width = pix.height, pix.width
+    ink = _ink_mask(_pixel_view(pix), limit)
+
+    rows = ink.any(axis=1)
+    if not rows.any():
+        return None
+    cols = ink.any(axis=0)
+
+    top = int(rows.argmax())
+    bottom = height - 1 - int(rows[::-1].argmax())
+    left = int(cols.argmax())
+    right = width - 1 - int(cols[::-1].argmax())
+    return left, top, right, bottom
+
+
+def _edge_blocks(length, reverse=False):
+    """从一端向另一端划分扫描块，块大小从 EDGE_BLOCK 开始逐块翻倍"""
+    size = EDGE_BLOCK
+    pos = 0
+    while pos < length:
+        stop = min(pos + size, length)
+        if reverse:
+            yield length - stop, length - pos
+        else:
+            yield pos, stop
+        pos = stop
+        size *= 2
+
+
+def _find_ink_bbox_numpy_edges(pix, limit):
+    height, width = pix.height, pix.width
+    img = _pixel_view(pix)
+
+    top = None
+    for start, stop in _edge_blocks(height):
+        rows = _ink_mask(img[start:stop], limit).any(axis=1)
+        if rows.any():
+            top = start + int(rows.argmax())
+            break
+    if top is None:
+        return None
+
+    bottom = top
+    for start, stop in _edge_blocks(height - top, reverse=True):
+        rows = _ink_mask(img[top + start:top + stop], limit).any(axis=1)
+        if rows.any():
+            bottom = top + stop - 1 - int(rows[::-1].argmax())
+            break
+
+    # 左右边界只需在 [top, bottom] 行之间查找
+    band = img[top:bottom + 1]
+    left = right = None
+    for start, stop in _edge_blocks(width):
+        cols = _ink_mask(band[:, start:stop], limit).any(axis=0)
+        if cols.any():
+            left = start + int(cols.argmax())
+            break
+    for start, stop in _edge_blocks(width - left, reverse=True):
+        cols = _ink_mask(band[:, left + start:left + stop], limit).any(axis=0)
+        if cols.any():
+            right = left + stop - 1 - int(cols[::-1].argmax())
+            break
+    return left, top, right, bottom
+
+
+def _find_ink_bbox_bytes(pix, limit):
+    width, height, n = pix.width, pix.height, pix.n
+    stride = getattr(pix, "stride", width * n)
+    samples = pix.samples
+    row_len = width * n
+
+    # 所有字节都 >= c 的行不可能包含内容，可以整行跳过
+    light = bytes(range(limit, 256))
+    dark_mask = bytes(1 if v < limit else 0 for v in range(256))
+
+    left = width
+    right = -1
+    top = -1
+    bottom = -1
+
+    for y in range(height):
+        start = y * stride
+        row = samples[start:start + row_len]
+        if not row.translate(None, light):
+            continue
+
+        if n < 3:
+            mask = row.translate(dark_mask)
+            if n == 1:
+                row_left = mask.find(1)
+                row_right = mask.rfind(1)
+            else:
+                gray = mask[::n]
+                row_left = gray.find(1)
+                row_right = gray.rfind(1)
+            if row_left < 0:
+                continue
+        else:
+            target = 3 * limit
+            row_left = -1
+            for x in range(width):
+                i = x * n
+                if row[i] + row[i + 1] + row[i + 2] < target:
+                    row_left = x
+                    break
+            if row_left < 0:
+                continue
+            row_right = row_left
+            for x in range(width - 1, row_left, -1):
+                i = x * n
+                if row[i] + row[i + 1] + row[i + 2] < target:
+                    row_right = x
+                    break
+
+        if top < 0:
+            top = y
+        bottom = y
+        left = min(left, row_left)
+        right = max(right, row_right)
+
+    if top < 0:
+        return None
+    return left, top, right, bottom
+
+
+def _find_ink_bbox_bytes_edges(pix, limit):
+    width, height, n = pix.width, pix.height, pix.n
+    stride = getattr(pix, "stride", width * n)
+    samples = pix.samples
+    row_len = width * n
+    light = bytes(range(limit, 256))
+
+    def row_at(y):
+        start = y * stride
+        return samples[start:start + row_len]
+
+    def is_ink(row, x):
+        i = x * n
+        if n >= 3:
+            return row[i] + row[i + 1] + row[i + 2] < 3 * limit
+        return row[i] < limit
+
+    def first_ink(row, xs):
+        for x in xs:
+            if is_ink(row, x):
+                return x
+        return None
+
+    # 上边界：自上而下找到第一行内容
+    top = None
+    for y in range(height):
+        row = row_at(y)
+        if row.translate(None, light) and first_ink(row, range(width)) is not None:
+            top = y
+            break
+    if top is None:
+        return None
+
+    # 下边界：自下而上找到第一行内容
+    bottom = top
+    for y in range(height - 1, top, -1):
+        row = row_at(y)
+        if row.translate(None, light) and first_ink(row, range(width)) is not None:
+            bottom = y
+            break
+
+    # 左右边界：每行只检查当前左右边界以外的部分
+    left = width
+    right = -1
+    for y in range(top, bottom + 1):
+        row = row_at(y)
+        if left > 0 and row[:left * n].translate(None, light):
+            x = first_ink(row, range(left))
+            if x is not None:
+                left = x
+        if right < width - 1 and row[(right + 1) * n:].translate(None, light):
+            x = first_ink(row, range(width - 1, right, -1))
+            if x is not None:
+                right = x
+        if left == 0 and right == width - 1:
+            break
+    return left, top, right, bottom
+
+
+def _min_count(min_density, length):
+    return max(1, math.ceil(min_density * length))
+
+
+def _first_run_numpy(flags, min_run):
+    """返回 flags 中第一段连续 min_run 个 True 的起点，不存在时返回 None"""
+    if min_run > 1:
+        flags = np.convolve(flags.astype(np.int32), np.ones(min_run, dtype=np.int32), "valid") == min_run
+    if not flags.size or not flags.any():
+        return None
+    return int(flags.argmax())
+
+
+def _find_ink_bbox_numpy_filtered(pix, limit, min_density, min_run):
+    height, width = pix.height, pix.width
+    ink = _ink_mask(_pixel_view(pix), limit)
+
+    rows = ink.sum(axis=1) >= _min_count(min_density, width)
+    top = _first_run_numpy(rows, min_run)
+    if top is None:
+        return None
+    bottom = height - 1 - _first_run_numpy(rows[::-1], min_run)
+
+    cols = ink[top:bottom + 1].sum(axis=0) >= _min_count(min_density, bottom - top + 1)
+    left = _first_run_numpy(cols, min_run)
+    if left is None:
+        return None
+    right = width - 1 - _first_run_numpy(cols[::-1], min_run)
+    return left, top, right, bottom
+
+
+def _first_run_list(flags, min_run):
+    run = 0
+    for i, flag in enumerate(flags):
+        run = run + 1 if flag else 0
+        if run >= min_run:
+            return i - min_run + 1
+    return None
+
+
+def _find_ink_bbox_bytes_filtered(pix, limit, min_density, min_run):
+    width, height, n = pix.width, pix.height, pix.n
+    stride = getattr(pix, "stride", width * n)
+    samples = pix.samples
+    dark_mask = bytes(1 if v < limit else 0 for v in range(256))
+
+    # 每行转换为每像素一个字节（1 表示内容）的掩码，拼成 height * width 的网格
+    masks = []
+    for y in range(height):
+        row = samples[y * stride:y * stride + width * n]
+        if n >= 3:
+            target = 3 * limit
+            masks.append(bytes(1 if row[i] + row[i + 1] + row[i + 2] < target else 0
+                               for i in range(0, width * n, n)))
+        else:
+            masks.append(row.translate(dark_mask)[::n])
+
+    min_count = _min_count(min_density, width)
+    rows = [mask.count(1) >= min_count for mask in masks]
+    top = _first_run_list(rows, min_run)
+    if top is None:
+        return None
+    bottom = height - 1 - _first_run_list(rows[::-1], min_run)
+
+    grid = b"".join(masks[top:bottom + 1])
+    min_count = _min_count(min_density, bottom - top + 1)
+    cols = [grid[x::width].count(1) >= min_count for x in range(width)]
+    left = _first_run_list(cols, min_run)
+    if left is None:
+        return None
+    right = width - 1 - _first_run_list(cols[::-1], min_run)
+    return left, top, right, bottom
+
+
+def find_ink_bbox(pix, threshold=0.1, scan=SCAN_FULL, min_density=0.0, min_run=1):
+    """返回 pixmap 中内容的像素边界 (left, top, right, bottom)，均为闭区间；无内容时返回 None
+
+    min_density 与 min_run（像素）为抗噪参数，见模块说明；默认不过滤。
+    """
+    if scan not in SCAN_MODES:
+        raise ValueError(f"未知的扫描方式: {scan}")
+    limit = ink_limit(threshold)
+    if pix.width == 0 or pix.height == 0 or limit == 0:
+        return None
+    if min_density > 0 or min_run > 1:
+        if np is not None:
+            return _find_ink_bbox_numpy_filtered(pix, limit, min_density, max(1, min_run))
+        return _find_ink_bbox_bytes_filtered(pix, limit, min_density, max(1, min_run))
+    if scan == SCAN_EDGES:
+        if np is not None:
+            return _find_ink_bbox_numpy_edges(pix, limit)
+        return _find_ink_bbox_bytes_edges(pix, limit)
+    if np is not None:
+        return _find_ink_bbox_numpy(pix, limit)
+    return _find_ink_bbox_bytes(pix, limit)
@@ -0,0 +1,362 @@
+"""PDF合并性能测试
+
+子命令：
+    outline   合并总页数不同的多组合成文档，对比每个书签的重映射耗时：
+              index 为按源文档页面字典查询，scan 为原先在已写入的全部页面中逐个查找
+    bookmarks 合并多个带深层书签的合成文档，逐项核对输出文档书签的层级、标题、
+              目标页与页内位置是否与源文档一致；没有目标页的书签应被省略，
+              其下级书签挂到它的上一级，两种合并方式的结果相同
+    memory    输入文件数不同时，对比 memory 与 stream 两种合并方式的耗时与峰值内存
+    inspect   对比逐个读取与进程池预读取全部输入文件的耗时，以及使用预读取结果后
+              合并本身的耗时；核对两种方式合并结果的书签一致，损坏的文件被标出
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz
+from PyPDF2 import PdfReader, PdfWriter
+
+from pdf_merge_core import (page_index, add_outline, merge_pdfs, inspect_pdf, SourceInspector,
+                            MERGE_MODES, MERGE_STREAM, FLUSH_MB)
+from pdf_trim_benchmark import peak_rss_kb
+
+
+def make_outline_document(path, pages, bookmarks, depth=1):
+    """生成 pages 页、带 bookmarks 个书签的文档，书签层级按 1..depth 循环"""
+    doc = fitz.open()
+    for page_num in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {page_num + 1}", fontsize=9)
+    step = max(1, pages // bookmarks)
+    toc = [[i % depth + 1, f"书签 {i + 1}", min(pages, i * step + 1)] for i in range(bookmarks)]
+    doc.set_toc(toc)
+    doc.save(path, garbage=1, deflate=True)
+    doc.close()
+
+
+def make_deep_outline_document(path, pages, bookmarks, depth, seed=0, unresolved_every=0):
+    """生成带随机层级书签的文档：层级最深为 depth，每个书签指向随机页面上的随机位置
+
+    unresolved_every 大于0时，每隔这么多个书签有一个没有目标页。
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {page_num + 1}", fontsize=9)
+    toc = []
+    level = 1
+    for i in range(bookmarks):
+        # 下一项最多比上一项深一级，可以回到任意较浅的层级
+        level = rng.randint(1, min(depth, level + 1)) if toc else 1
+        page_num = rng.randint(1, pages)
+        title = f"{os.path.basename(path)} {i + 1}"
+        if unresolved_every and i % unresolved_every == unresolved_every - 1:
+            toc.append([level, title, -1])
+            continue
+        dest = {"kind": fitz.LINK_GOTO, "page": page_num - 1, "to": fitz.Point(72, rng.uniform(36, 800))}
+        toc.append([level, title, page_num, dest])
+    doc.set_toc(toc)
+    doc.save(path, garbage=1, deflate=True)
+    doc.close()
+
+
+def _toc_entry(entry, page_offset=0, level_offset=0):
+    """把 get_toc(simple=False) 的一项转换为便于比较的 (层级, 标题, 页码, 页内位置)"""
+    level, title, page_num, dest = entry[:4]
+    to = dest.get("to")
+    return level + level_offset, title, page_num + page_offset, round(to.y, 1) if to is not None else None
+
+
+def _expected_entries(toc, page_offset):
+    """源文档书签在输出中应有的 (层级, 标题, 页码, 页内位置)：没有目标页的书签省略，
+    其余书签的层级为它有目标页的上级书签数加2（文件名书签为第1级）"""
+    expected = []
+    ancestors = []  # 当前书签的各级上级：(层级, 是否有目标页)
+    for entry in toc:
+        level, page_num = entry[0], entry[2]
+        while ancestors and ancestors[-1][0] >= level:
+            ancestors.pop()
+        if page_num >= 1:
+            resolved = sum(1 for _, has_target in ancestors if has_target)
+            expected.append(_toc_entry(entry, page_offset, resolved + 2 - level))
+        ancestors.append((level, page_num >= 1))
+    return expected
+
+
+def bench_bookmarks(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sources = []
+        expected = []
+        offset = 0
+        for file_num in range(args.files):
+            # 各文件页数不同，使后面文件的书签都需要正确的页码偏移
+            pages = args.file_pages + file_num * 7
+            path = os.path.join(tmp_dir, f"deep_{file_num + 1}.pdf")
+            make_deep_outline_document(path, pages, args.bookmarks, args.depth, seed=file_num,
+                                       unresolved_every=args.unresolved_every)
+            title = os.path.basename(path)
+            sources.append((path, title))
+            # 文件名书签按整页显示，不比较页内位置
+            expected.append((1, title, offset + 1, None))
+            doc = fitz.open(path)
+            expected.extend(_expected_entries(doc.get_toc(simple=False), offset))
+            doc.close()
+            offset += pages
+
+        failed = False
+        for mode in args.modes:
+            output_path = os.path.join(tmp_dir, f"merged_{mode}.pdf")
+            report = merge_pdfs(sources, output_path, mode=mode, flush_mb=args.flush_mb)
+            doc = fitz.open(output_path)
+            actual = [_toc_entry(entry) for entry in doc.get_toc(simple=False)]
+            doc.close()
+
+            mismatches = [(i, want, got) for i, (want, got) in enumerate(zip(expected, actual))
+                          if want[:3] != got[:3] or want[3] not in (None, got[3])]
+            print(f"{mode} 方式合并 {args.files} 个文件，{report.pages} 页，{len(expected)} 个书签"
+                  f"（最深 {args.depth + 1} 级），耗时 {report.seconds:.2f} 秒")
+            if len(expected) != len(actual):
+                print(f"书签数不一致：应为 {len(expected)}，实际 {len(actual)}")
+            for i, want, got in mismatches[:10]:
+                print(f"第 {i + 1} 个书签不一致：应为 {want}，实际 {got}")
+            if mismatches or len(expected) != len(actual):
+                failed = True
+            else:
+                print("书签层级、标题、目标页与页内位置全部一致")
+    if failed:
+        raise SystemExit(1)
+
+
+def make_image_document(path, pages, seed=0, size=600):
+    """生成每页一幅随机噪声图像的文档，图像无法压缩，文件大小约为 pages * size * size * 3 字节"""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        pix = fitz.Pixmap(fitz.csRGB, size, size, rng.randbytes(size * size * 3), False)
+        page.insert_image(fitz.Rect(50, 50, 545, 545), pixmap=pix)
+    doc.set_toc([[1, "第一章", 1], [2, "第一节", min(pages, 2)], [1, "第二章", pages]])
+    doc.save(path, deflate=True)
+    doc.close()
+
+
+def run_merge(args):
+    """在独立进程中合并一次，把耗时与峰值内存写入 args.result"""
+    with open(args.inputs, encoding="utf-8") as f:
+        inputs = json.load(f)
+    report = merge_pdfs([(path, os.path.basename(path)) for path in inputs], args.output,
+                        mode=args.mode, flush_mb=args.flush_mb)
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump({"seconds": report.seconds, "pages": report.pages, "peak_rss_kb": peak_rss_kb(),
+                   "output_bytes": report.output_bytes}, f)
+
+
+def bench_memory(args):
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="merge_corpus_")
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = []
+    for file_num in range(max(args.files)):
+        path = os.path.join(corpus_dir, f"image_{args.file_pages}_{file_num + 1:03d}.pdf")
+        if not os.path.exists(path):
+            make_image_document(path, args.file_pages, seed=file_num)
+        paths.append(path)
+    file_mb = os.path.getsize(paths[0]) / 1024 / 1024
+
+    print(f"合并峰值内存（每个文件 {args.file_pages} 页、约 {file_mb:.1f} MB，stream 每 {args.flush_mb:g} MB 保存一次）")
+    print(f"{'文件数':>6} {'输入(MB)':>9} {'方式':>7} {'耗时(s)':>9} {'峰值内存(MB)':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for files in args.files:
+            inputs_path = os.path.join(tmp_dir, "inputs.json")
+            with open(inputs_path, "w", encoding="utf-8") as f:
+                json.dump(paths[:files], f)
+            input_mb = sum(os.path.getsize(path) for path in paths[:files]) / 1024 / 1024
+            for mode in args.modes:
+                result_path = os.path.join(tmp_dir, "result.json")
+                # 每项在新进程中运行，峰值内存互不影响
+                command = [sys.executable, os.path.abspath(__file__), "run-merge", "--inputs", inputs_path,
+                           "--output", os.path.join(tmp_dir, "merged.pdf"), "--result", result_path,
+                           "--mode", mode, "--flush-mb", str(args.flush_mb)]
+                completed = subprocess.run(command, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    raise RuntimeError(f"{files} 个文件 {mode} 合并失败:\n{completed.stderr}")
+                with open(result_path, encoding="utf-8") as f:
+                    measured = json.load(f)
+                rss = measured["peak_rss_kb"]
+                print(f"{files:>6} {input_mb:>9.1f} {mode:>7} {measured['seconds']:>9.2f} "
+                      f"{rss / 1024 if rss else 0:>12.1f}")
+
+
+def bench_outline(args):
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="merge_corpus_")
+    os.makedirs(corpus_dir, exist_ok=True)
+    source = os.path.join(corpus_dir, f"outline_{args.file_pages}_{args.bookmarks}_{args.depth}.pdf")
+    if not os.path.exists(source):
+        make_outline_document(source, args.file_pages, args.bookmarks, args.depth)
+
+    print(f"书签重映射耗时（每个文件 {args.file_pages} 页、{args.bookmarks} 个书签、{args.depth} 级）")
+    print(f"{'总页数':>8} {'文件数':>6} {'书签数':>7} {'index(us/个)':>13} {'scan(us/个)':>12}")
+    for total in args.pages:
+        files = math.ceil(total / args.file_pages)
+        readers = [PdfReader(source) for _ in range(files)]
+        writer = PdfWriter()
+        offsets = []
+        for reader in readers:
+            offsets.append(len(writer.pages))
+            for page in reader.pages:
+                writer.add_page(page)
+        outlines = [reader.outline for reader in readers]
+        count = sum(len(list(_flatten(outline))) for outline in outlines)
+
+        # 计时前先回收垃圾，避免计时段内碰上一次全量回收
+        gc.collect()
+        # index：每个源文件构建一次页面字典，逐个书签查询后添加到输出文档
+        start = time.perf_counter()
+        outline_root = writer.get_outline_root()
+        for reader, outline, offset in zip(readers, outlines, offsets):
+            parent = writer.add_outline_item(os.path.basename(source), offset, parent=outline_root)
+            add_outline(writer, outline, page_index(reader), parent=parent, offset=offset)
+        index_cost = (time.perf_counter() - start) / count
+
+        # scan：原实现的查找方式，在已写入的全部页面引用中按 list.index 查找目标页
+        refs = [page.indirect_reference for page in writer.pages]
+        targets = []
+        for reader, outline, offset in zip(readers, outlines, offsets):
+            index = page_index(reader)
+            targets.extend(refs[index[item.page.idnum] + offset] for item in _flatten(outline))
+        gc.collect()
+        start = time.perf_counter()
+        for target in targets:
+            refs.index(target)
+        scan_cost = (time.perf_counter() - start) / count
+
+        print(f"{total:>8} {files:>6} {count:>7} {index_cost * 1e6:>13.1f} {scan_cost * 1e6:>12.1f}")
+
+
+def bench_inspect(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for file_num in range(args.files):
+            path = os.path.join(tmp_dir, f"input_{file_num + 1:03d}.pdf")
+            make_outline_document(path, args.file_pages, args.bookmarks, depth=3)
+            paths.append(path)
+        # 截断的文件应在预读取时被标出
+        broken_path = os.path.join(tmp_dir, "broken.pdf")
+        with open(paths[0], "rb") as src, open(broken_path, "wb") as dst:
+            dst.write(src.read(200))
+
+        gc.collect()
+        start = time.perf_counter()
+        serial = [inspect_pdf(path) for path in paths + [broken_path]]
+        serial_seconds = time.perf_counter() - start
+
+        inspector = SourceInspector(workers=args.workers)
+        gc.collect()
+        start = time.perf_counter()
+        inspector.submit(paths + [broken_path])
+        while inspector.busy:
+            inspector.poll()
+            time.sleep(0.005)
+        parallel_seconds = time.perf_counter() - start
+        inspector.shutdown()
+
+        print(f"预读取 {len(serial)} 个文件（每个 {args.file_pages} 页、{args.bookmarks} 个书签）：")
+        print(f"  逐个读取 {serial_seconds:.2f} 秒，进程池（{args.workers or os.cpu_count()} 个进程）"
+              f"{parallel_seconds:.2f} 秒（含启动进程池）")
+        flagged = [info for info in inspector.infos.values() if info.error]
+        print(f"  无法合并的文件：{', '.join(f'{os.path.basename(info.path)}（{info.error}）' for info in flagged)}")
+        if [info.path for info in flagged] != [broken_path]:
+            raise SystemExit(1)
+        if [(info.pages, info.toc) for info in serial[:-1]] != [(inspector.infos[path].pages, inspector.infos[path].toc)
+                                                                for path in paths]:
+            print("逐个读取与进程池读取的结果不一致")
+            raise SystemExit(1)
+
+        sources = [(path, os.path.basename(path)) for path in paths]
+        tocs = []
+        for label, infos in (("不使用预读取结果", None), ("使用预读取结果", inspector.infos)):
+            output_path = os.path.join(tmp_dir, "merged.pdf")
+            gc.collect()
+            report = merge_pdfs(sources, output_path, mode=MERGE_STREAM, infos=infos)
+            with fitz.open(output_path) as doc:
+                tocs.append([_toc_entry(entry) for entry in doc.get_toc(simple=False)])
+            print(f"  合并（{label}）{report.seconds:.2f} 秒，{report.pages} 页")
+    if tocs[0] != tocs[1]:
+        print("两次合并的书签不一致")
+        raise SystemExit(1)
+    print(f"两次合并的 {len(tocs[0])} 个书签一致")
+
+
+def _flatten(outline):
+    for item in outline:
+        if isinstance(item, list):
+            yield from _flatten(item)
+        else:
+            yield item
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF合并性能测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    outline_parser = subparsers.add_parser('outline', help='测试书签重映射耗时是否随总页数增长')
+    outline_parser.add_argument('--pages', type=int, nargs='+', default=[1000, 5000, 20000],
+                                help='合并后的总页数，默认为 1000 5000 20000')
+    outline_parser.add_argument('--file-pages', type=int, default=500, help='每个源文件的页数，默认为500')
+    outline_parser.add_argument('--bookmarks', type=int, default=50, help='每个源文件的书签数，默认为50')
+    outline_parser.add_argument('--depth', type=int, default=3, help='书签的最大层级，默认为3')
+    outline_parser.add_argument('--corpus-dir', help='合成文档目录，已存在的文档直接复用，默认为临时目录')
+    outline_parser.set_defaults(func=bench_outline)
+
+    bookmarks_parser = subparsers.add_parser('bookmarks', help='核对合并后深层书签的层级与目标是否正确')
+    bookmarks_parser.add_argument('--files', type=int, default=8, help='源文件数，默认为8')
+    bookmarks_parser.add_argument('--file-pages', type=int, default=120, help='第一个源文件的页数，默认为120')
+    bookmarks_parser.add_argument('--bookmarks', type=int, default=300, help='每个源文件的书签数，默认为300')
+    bookmarks_parser.add_argument('--depth', type=int, default=8, help='书签的最大层级，默认为8')
+    bookmarks_parser.add_argument('--unresolved-every', type=int, default=17,
+                                  help='每隔多少个书签有一个没有目标页，0表示全部有目标页，默认为17')
+    bookmarks_parser.add_argument('--modes', nargs='+', choices=MERGE_MODES, default=list(MERGE_MODES),
+                                  help='核对的合并方式，默认为全部')
+    bookmarks_parser.add_argument('--flush-mb', type=float, default=FLUSH_MB,
+                                  help=f'stream 方式每插入多少 MB 保存一次，默认为{FLUSH_MB}')
+    bookmarks_parser.set_defaults(func=bench_bookmarks)
+
+    memory_parser = subparsers.add_parser('memory', help='对比两种合并方式的峰值内存')
+    memory_parser.add_argument('--files', type=int, nargs='+', default=[4, 16, 48],
+                               help='合并的文件数，默认为 4 16 48')
+    memory_parser.add_argument('--file-pages', type=int, default=8,
+                               help='每个文件的页数（每页约 1 MB 的图像），默认为8')
+    memory_parser.add_argument('--modes', nargs='+', choices=MERGE_MODES, default=list(MERGE_MODES),
+                               help='对比的合并方式，默认为全部')
+    memory_parser.add_argument('--flush-mb', type=float, default=FLUSH_MB,
+                               help=f'stream 方式每插入多少 MB 保存一次，默认为{FLUSH_MB}')
+    memory_parser.add_argument('--corpus-dir', help='合成文档目录，已存在的文档直接复用，默认为临时目录')
+    memory_parser.set_defaults(func=bench_memory)
+
+    inspect_parser = subparsers.add_parser('inspect', help='对比逐个读取与进程池预读取输入文件的耗时')
+    inspect_parser.add_argument('--files', type=int, default=40, help='输入文件数，默认为40')
+    inspect_parser.add_argument('--file-pages', type=int, default=200, help='每个文件的页数，默认为200')
+    inspect_parser.add_argument('--bookmarks', type=int, default=100, help='每个文件的书签数，默认为100')
+    inspect_parser.add_argument('--workers', type=int, default=None, help='进程数，默认为CPU核心数')
+    inspect_parser.set_defaults(func=bench_inspect)
+
+    merge_parser = subparsers.add_parser('run-merge', help=argparse.SUPPRESS)
+    merge_parser.add_argument('--inputs', required=True)
+    merge_parser.add_argument('--output', required=True)
+    merge_parser.add_argument('--result', required=True)
+    merge_parser.add_argument('--mode', choices=MERGE_MODES, required=True)
+    merge_parser.add_argument('--flush-mb', type=float, default=FLUSH_MB)
+    merge_parser.set_defaults(func=run_merge)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""PDF合并核心模块
+
+pdfmerge.py 与 pdf-ppt.py 共用的合并引擎，不依赖 Qt，可在后台线程中运行：
+逐页报告进度，每开始处理一个文件回调一次，可随时取消。
+输出先写入同目录下的临时文件，全部成功后再替换为目标文件，
+取消或出错时删除临时文件，不会留下写了一半的输出。
+
+合并方式 mode：
+    memory —— 用 PyPDF2 把全部输入读入内存后一次写出，内存随输入总大小增长；
+    stream —— 用 PyMuPDF 逐个文件插入页面，插入后立即关闭源文件，
+              累计插入约 flush_mb 后增量保存到临时文件并释放内存，
+              峰值内存约为 flush_mb 与最大单个输入文件二者中的较大者。
+安装了 PyMuPDF 时默认使用 stream，否则使用 memory。
+
+SourceInspector 在文件加入列表时就在进程池中预先读取各文件的页数与书签，
+并检查文件能否打开；合并时直接使用缓存的结果，只做最后的拼装。
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import Fit
+
+try:
+    import fitz
+except ImportError:  # 没有 PyMuPDF 时只能使用 memory 方式
+    fitz = None
+
+MERGE_MEMORY = "memory"
+MERGE_STREAM = "stream"
+MERGE_MODES = (MERGE_MEMORY, MERGE_STREAM)
+
+# stream 方式下累计插入多少输入(MB)后增量保存一次。MuPDF 每次增量保存的耗时
+# 与已写入的文件大小成正比，过小会使大文件合并变慢，过大则占用更多内存
+FLUSH_MB = 64
+# stream 方式下每次插入的页数，也是检查取消与报告进度的间隔
+INSERT_BATCH = 64
+
+# 各种目标视图类型依次需要的参数，见 PDF 1.7 参考手册表 8.2
+_FIT_ARGS = {
+    "/XYZ": ("/Left", "/Top", "/Zoom"),
+    "/FitR": ("/Left", "/Bottom", "/Right", "/Top"),
+    "/FitH": ("/Top",),
+    "/FitBH": ("/Top",),
+    "/FitV": ("/Left",),
+    "/FitBV": ("/Left",),
+    "/Fit": (),
+    "/FitB": (),
+}
+
+
+class MergeCancelled(Exception):
+    """合并被取消"""
+
+
+@dataclass
+class MergeReport:
+    """合并结果统计"""
+    files: int = 0
+    pages: int = 0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def pages_per_sec(self):
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_sec(self):
+        """按输入文件大小计算的每秒处理量(MB)"""
+        return self.input_bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+    def format_summary(self):
+        return (f"{self.files} 个文件，{self.pages} 页，耗时 {self.seconds:.1f} 秒"
+                f"（{self.pages_per_sec:.0f} 页/秒，{self.mb_per_sec:.1f} MB/秒），"
+                f"输出 {self.output_bytes / 1024 / 1024:.1f} MB")
+
+
+@dataclass
+class SourceInfo:
+    """预先读取的输入文件信息，文件大小或修改时间变化后失效"""
+    path: str
+    size: int
+    mtime: float
+    pages: int = 0
+    toc: list = field(default_factory=list)  # 与 get_toc(simple=False) 格式相同，目标位置为普通元组
+    error: str = ""  # 无法合并时的原因
+
+    @property
+    def bookmarks(self):
+        return len(self.toc)
+
+    def is_current(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+
+def _plain_toc(toc):
+    """把 get_toc(simple=False) 的结果转换为可以 pickle 的普通列表"""
+    entries = []
+    for level, title, page_num, *rest in toc:
+        dest = rest[0] if rest else {}
+        to = dest.get("to")
+        plain = {"kind": dest.get("kind", fitz.LINK_NONE), "zoom": dest.get("zoom", 0)}
+        if to is not None:
+            plain["to"] = (to.x, to.y)
+        entries.append([level, title, page_num, plain])
+    return entries
+
+
+def inspect_pdf(path):
+    """打开 path 读取页数与书签，返回 SourceInfo；文件无法合并时把原因写入 error"""
+    stat = os.stat(path)
+    info = SourceInfo(path, stat.st_size, stat.st_mtime)
+    try:
+        if fitz is not None:
+            try:
+                doc = fitz.open(path)
+            except Exception:
+                info.error = "文件已损坏或不是 PDF"
+                return info
+            with doc:
+                if not doc.is_pdf:
+                    info.error = "不是 PDF 文件"
+                elif doc.needs_pass:
+                    info.error = "文件已加密，需要密码"
+                else:
+                    info.pages = doc.page_count
+                    info.toc = _plain_toc(doc.get_toc(simple=False))
+        else:
+            reader = PdfReader(path)
+            if reader.is_encrypted:
+                info.error = "文件已加密，需要密码"
+            else:
+                info.pages = len(reader.pages)
+        if not info.error and not info.pages:
+            info.error = "文件中没有页面"
+    except Exception as e:
+        info.error = str(e) or type(e).__name__
+    return info
+
+
+class SourceInspector:
+    """在进程池中预先读取待合并的文件，结果按路径缓存
+
+    界面在文件加入列表时调用 submit()，再按固定间隔调用 poll() 取得新完成的结果，
+    与裁剪工具的进度显示一样不依赖信号。
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.infos = {}
+        self._executor = None
+        self._pending = {}  # future -> path
+        self._pending_paths = set()
+
+    @property
+    def busy(self):
+        return bool(self._pending)
+
+    def get(self, path):
+        """返回 path 的缓存信息，尚未读取或文件已变化时返回 None"""
+        info = self.infos.get(path)
+        return info if info is not None and info.is_current() else None
+
+    def submit(self, paths):
+        """提交尚无有效缓存的文件"""
+        for path in paths:
+            if path in self._pending_paths or self.get(path) is not None:
+                continue
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers or os.cpu_count() or 1)
+            self._pending[self._executor.submit(inspect_pdf, path)] = path
+            self._pending_paths.add(path)
+
+    def poll(self):
+        """收集已完成的结果，返回本次新得到的 SourceInfo 列表"""
+        results = []
+        for future in [future for future in self._pending if future.done()]:
+            path = self._pending.pop(future)
+            self._pending_paths.discard(path)
+            try:
+                info = future.result()
+            except Exception as e:  # 工作进程异常退出等
+                info = SourceInfo(path, 0, 0, error=str(e) or type(e).__name__)
+            self.infos[path] = info
+            results.append(info)
+        return results
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+        self._pending_paths.clear()
+
+
+def _check_cancel(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise MergeCancelled("合并已取消")
+
+
+class _CancellableWriter:
+    """包装输出文件，每次写入前检查是否已取消，使保存阶段也能及时中止"""
+
+    def __init__(self, f, cancel_event):
+        self.f = f
+        self.cancel_event = cancel_event
+
+    def write(self, data):
+        _check_cancel(self.cancel_event)
+        return self.f.write(data)
+
+    def tell(self):
+        return self.f.tell()
+
+    def seek(self, *args):
+        return self.f.seek(*args)
+
+    def flush(self):
+        return self.f.flush()
+
+
+def page_index(reader):
+    """返回源文档中页面对象编号到页码（从0开始）的字典
+
+    每个源文件只构建一次，之后每个书签的目标页都是一次字典查询，
+    不再在已写入的全部页面中逐个查找，书签重映射的耗时与总页数无关。
+    """
+    return {page.indirect_reference.idnum: i for i, page in enumerate(reader.pages)}
+
+
+def _dest_page(dest, index):
+    """返回书签在源文档中的目标页码，无法解析时返回 None"""
+    page = getattr(dest, "page", None)
+    if isinstance(page, int):  # 少数文档直接以页码作为目标
+        return page if page >= 0 else None
+    return index.get(getattr(page, "idnum", None))
+
+
+def _dest_fit(dest):
+    """返回书签原有的目标视图（位置与缩放），未知类型时为整页显示"""
+    fit_type = dest.get("/Type")
+    keys = _FIT_ARGS.get(fit_type)
+    if keys is None:
+        return Fit.fit()
+    return Fit(fit_type, tuple(dest.get(key) for key in keys))
+
+
+def outline_entries(outline, index, depth=0):
+    """按先序遍历 PyPDF2 的书签树，逐项产出 (depth, title, page_num, fit)
+
+    outline 为 reader.outline：列表中的子列表是其前一项的下级书签。
+    page_num 为按 index 解析出的源文档页码，无法解析时为 None。
+    """
+    for item in outline:
+        if isinstance(item, list):
+            yield from outline_entries(item, index, depth + 1)
+            continue
+        yield depth, item.get("/Title", "Untitled"), _dest_page(item, index), _dest_fit(item)
+
+
+def add_outline(writer, outline, index, parent=None, offset=0):
+    """把源文档的书签树一次遍历写到 parent 下，保持原有层级与目标视图
+
+    目标页按源文档的 index 解析后加上 offset（该文件在输出文档中的起始页）；
+    目标页无法解析的书签不添加，其下级书签挂到它的上一级。
+    """
+    # parents[d] 为第 d 级书签的父节点
+    parents = [parent]
+    for depth, title, page_num, fit in outline_entries(outline, index):
+        del parents[depth + 1:]
+        while len(parents) <= depth:  # 子列表前没有上级书签
+            parents.append(parents[-1])
+        if page_num is None:
+            parents.append(parents[-1])
+        else:
+            parents.append(writer.add_outline_item(title, page_num + offset, parent=parents[-1], fit=fit))
+
+
+@contextmanager
+def atomic_output(output_path):
+    """产出与 output_path 同目录的临时文件路径，with 块正常结束后替换为 output_path，出错或取消时删除"""
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".merging-", suffix=".pdf", dir=output_dir)
+    os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _merge_memory(sources, temp_path, progress_callback, file_callback, cancel_event):
+    readers = []
+    for file_num, (pdf_path, title) in enumerate(sources):
+        _check_cancel(cancel_event)
+        if file_callback:
+            file_callback(file_num, len(sources), pdf_path)
+        reader = PdfReader(pdf_path)
+        readers.append((title, reader, page_index(reader)))
+    total = sum(len(index) for _, _, index in readers)
+
+    pdf_writer = PdfWriter()
+    bookmarks = []
+    done = 0
+    for file_num, (title, reader, index) in enumerate(readers):
+        if file_callback:
+            file_callback(file_num, len(sources), sources[file_num][0])
+        bookmarks.append((title, done, reader.outline or [], index))
+        for page in reader.pages:
+            _check_cancel(cancel_event)
+            pdf_writer.add_page(page)
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+
+    # 写入页面后再添加书签。不指定 parent 时 PyPDF2 每次都在全部对象中查找书签根节点，
+    # 因此只取一次根节点，作为各文件一级书签的 parent
+    outline_root = pdf_writer.get_outline_root()
+    for title, start_page, outline, index in bookmarks:
+        _check_cancel(cancel_event)
+        top_level = pdf_writer.add_outline_item(title, start_page, parent=outline_root)
+        add_outline(pdf_writer, outline, index, parent=top_level, offset=start_page)
+
+    with open(temp_path, "wb") as f:
+        pdf_writer.write(_CancellableWriter(f, cancel_event))
+    return total
+
+
+def shifted_toc(toc, offset):
+    """把源文档 get_toc(simple=False) 的书签下移一级、目标页加上 offset，保留页内位置与缩放
+
+    与 add_outline 相同，没有目标页的书签不添加，其下级书签挂到它的上一级。
+    """
+    entries = []
+    # levels[d] 为源文档第 d 级书签的父节点在输出中的层级
+    levels = [1]
+    for level, title, page_num, *rest in toc:
+        del levels[level:]
+        while len(levels) < level:
+            levels.append(levels[-1])
+        if page_num < 1:
+            levels.append(levels[-1])
+            continue
+        out_level = levels[-1] + 1
+        levels.append(out_level)
+        dest = rest[0] if rest else {}
+        if dest.get("kind") == fitz.LINK_GOTO and dest.get("to") is not None:
+            entries.append([out_level, title, page_num + offset,
+                            {"kind": fitz.LINK_GOTO, "to": dest["to"], "zoom": dest.get("zoom", 0)}])
+        else:
+            entries.append([out_level, title, page_num + offset])
+    return entries
+
+
+def _merge_stream(sources, infos, temp_path, progress_callback, file_callback, cancel_event, flush_mb):
+    total = sum(info.pages for info in infos)
+    if progress_callback:
+        progress_callback(0, total)
+    toc = []
+    done = 0
+    doc = None
+    saved = False
+    pending = 0
+    try:
+        for file_num, ((pdf_path, title), info) in enumerate(zip(sources, infos)):
+            if file_callback:
+                file_callback(file_num, len(sources), pdf_path)
+            if doc is None:
+                doc = fitz.open(temp_path) if saved else fitz.open()
+            toc.append([1, title, done + 1])
+            toc.extend(shifted_toc(info.toc, done))
+            with fitz.open(pdf_path) as src:
+                for start in range(0, info.pages, INSERT_BATCH):
+                    _check_cancel(cancel_event)
+                    doc.insert_pdf(src, from_page=start, to_page=min(start + INSERT_BATCH, info.pages) - 1)
+                    done += min(INSERT_BATCH, info.pages - start)
+                    if progress_callback:
+                        progress_callback(done, total)
+            pending += info.size
+
+            # 已插入的页面保存到临时文件后关闭文档，释放复制进来的对象
+            if pending >= flush_mb * 1024 * 1024:
+                _check_cancel(cancel_event)
+                if saved:
+                    doc.saveIncr()
+                else:
+                    doc.save(temp_path)
+                    saved = True
+                doc.close()
+                doc = None
+                pending = 0
+
+        _check_cancel(cancel_event)
+        if doc is None:
+            doc = fitz.open(temp_path)
+        doc.set_toc(toc, collapse=0)
+        if saved:
+            doc.saveIncr()
+        else:
+            doc.save(temp_path)
+    finally:
+        if doc is not None:
+            doc.close()
+    return total
+
+
+def _source_infos(sources, cached, file_callback, cancel_event):
+    """按 sources 的顺序返回 SourceInfo，缓存中没有或已失效的文件在此读取"""
+    infos = []
+    for file_num, (pdf_path, _) in enumerate(sources):
+        _check_cancel(cancel_event)
+        info = cached.get(pdf_path)
+        if info is None or not info.is_current():
+            if file_callback:
+                file_callback(file_num, len(sources), pdf_path)
+            info = inspect_pdf(pdf_path)
+        if info.error:
+            raise ValueError(f"无法合并 {os.path.basename(pdf_path)}：{info.error}")
+        infos.append(info)
+    return infos
+
+
+def merge_pdfs(sources, output_path, progress_callback=None, file_callback=None, cancel_event=None,
+               mode=None, flush_mb=FLUSH_MB, infos=None):
+    """按顺序合并 sources 中的 (pdf_path, title)，每个文件以 title 为一级书签，返回 MergeReport
+
+    progress_callback(done, total) 在添加页面后调用，参数为页数；
+    file_callback(index, count, pdf_path) 在开始读取及开始添加第 index 个文件（从0开始）的页面时调用；
+    cancel_event（threading.Event）被设置后在下一批页面或下一次写入时抛出 MergeCancelled。
+    mode 为合并方式，见 MERGE_MODES，默认安装了 PyMuPDF 时为 stream。
+    infos 为 {pdf_path: SourceInfo}，stream 方式直接使用其中仍然有效的页数与书签，
+    其余文件在合并前读取；任何文件无法合并时抛出 ValueError，不生成输出。
+    """
+    if mode is None:
+        mode = MERGE_STREAM if fitz is not None else MERGE_MEMORY
+    if mode not in MERGE_MODES:
+        raise ValueError(f"未知的合并方式: {mode}")
+    if mode == MERGE_STREAM and fitz is None:
+        raise RuntimeError("stream 合并方式需要安装 PyMuPDF")
+
+    start = time.perf_counter()
+    report = MergeReport(files=len(sources),
+                         input_bytes=sum(os.path.getsize(pdf_path) for pdf_path, _ in sources))
+    if mode == MERGE_STREAM:
+        infos = _source_infos(sources, infos or {}, file_callback, cancel_event)
+    with atomic_output(output_path) as temp_path:
+        if mode == MERGE_STREAM:
+            report.pages = _merge_stream(sources, infos, temp_path, progress_callback, file_callback,
+                                         cancel_event, flush_mb)
+        else:
+            report.pages = _merge_memory(sources, temp_path, progress_callback, file_callback, cancel_event)
+
+    report.output_bytes = os.path.getsize(output_path)
+    report.seconds = time.perf_counter() - start
+    return report
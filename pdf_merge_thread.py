@@ -0,0 +1,79 @@
+"""PDF 合并界面的公共部分
+
+pdfmerge.py 与 pdf-ppt.py 共用的后台合并线程，以及按预读取结果刷新文件列表的函数。
+"""
+import os
+import threading
+
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor
+
+from pdf_merge_core import merge_pdfs, MergeCancelled
+from pdf_trim_progress import ProgressCounter
+
+
+class MergeThread(QThread):
+    """在后台线程中合并 PDF，界面定时读取 progress 显示进度"""
+    file_started = pyqtSignal(int, int, str)
+    task_completed = pyqtSignal(bool, str)
+
+    def __init__(self, sources, output_path, infos=None):
+        super().__init__()
+        self.sources = sources
+        self.output_path = output_path
+        self.infos = infos
+        self.cancel_event = threading.Event()
+        # 工作线程只写入计数器，界面定时读取，不为每一页发送信号
+        self.progress = ProgressCounter()
+        self.report = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            self.report = merge_pdfs(self.sources, self.output_path,
+                                     progress_callback=self.progress.update,
+                                     file_callback=self.file_started.emit,
+                                     cancel_event=self.cancel_event,
+                                     infos=self.infos)
+            self.task_completed.emit(True, f"PDF 已成功合并到：\n{self.output_path}\n\n"
+                                           f"{self.report.format_summary()}")
+        except MergeCancelled:
+            self.task_completed.emit(False, "合并已取消，未生成输出文件。")
+        except Exception as e:
+            self.task_completed.emit(False, f"合并过程中出错：{str(e)}")
+
+
+def source_label(file, info):
+    """列表中显示的文本：文件名加页数，读取失败时显示原因"""
+    name = os.path.basename(file)
+    if info is None:
+        return f"{name}（读取中...）"
+    if info.error:
+        return f"{name}（无法合并：{info.error}）"
+    return f"{name}（{info.pages} 页）"
+
+
+def update_source_items(file_list, inspector):
+    """按 inspector 的缓存刷新列表中各文件的页数显示，无法合并的文件标为红色"""
+    for i in range(file_list.count()):
+        item = file_list.item(i)
+        file = item.data(Qt.UserRole)
+        info = inspector.get(file)
+        item.setText(source_label(file, info))
+        if info is not None and info.error:
+            item.setForeground(QBrush(QColor("red")))
+        else:
+            item.setForeground(QBrush())
+
+
+def invalid_sources(file_list, inspector):
+    """返回已读取且无法合并的文件说明列表"""
+    invalid = []
+    for i in range(file_list.count()):
+        file = file_list.item(i).data(Qt.UserRole)
+        info = inspector.get(file)
+        if info is not None and info.error:
+            invalid.append(f"{os.path.basename(file)}：{info.error}")
+    return invalid
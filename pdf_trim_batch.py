@@ -0,0 +1,215 @@
+"""PDF白边批量裁剪
+
+把目录、通配符与文件路径展开为待处理文件列表，在同一个进程池中按文件并行裁剪，
+避免每个文件都单独启动解释器并导入 PyMuPDF。大文件先处理，使最后一批
+文件的等待时间尽量短；输出文件比输入文件新时跳过。
+"""
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+
+from pdf_trim_cache import BBoxCache
+from pdf_trim_core import trim_pdf, default_workers
+
+STATUS_OK = "ok"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class FileResult:
+    """单个文件的裁剪结果"""
+    input_path: str
+    output_path: str
+    status: str
+    pages: int = 0
+    seconds: float = 0.0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    error: str = ""
+
+    @property
+    def reduction(self):
+        """文件大小减少的百分比"""
+        if not self.input_bytes or not self.output_bytes:
+            return 0.0
+        return (1 - self.output_bytes / self.input_bytes) * 100
+
+
+def is_glob(pattern):
+    return any(ch in pattern for ch in "*?[")
+
+
+def collect_inputs(patterns, recursive=False):
+    """把文件路径、目录和通配符展开为 PDF 文件列表，保持首次出现的顺序并去重"""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            sub = os.path.join("**", "*") if recursive else "*"
+            matches = glob.glob(os.path.join(glob.escape(pattern), sub), recursive=recursive)
+        elif os.path.isfile(pattern):  # 文件名中的 [ ] 等字符不按通配符解释
+            matches = [pattern]
+        elif is_glob(pattern):
+            matches = glob.glob(pattern, recursive=recursive)
+        else:
+            matches = [pattern]
+        found.extend(sorted(path for path in matches
+                            if path.lower().endswith(".pdf") and os.path.isfile(path)))
+    seen = set()
+    unique = []
+    for path in found:
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def output_path_for(input_path, output_dir=None, base_dir=None, suffix="_cropped"):
+    """输出路径：默认与输入同目录、文件名加 suffix；指定 output_dir 时按相对 base_dir 的路径放入其中"""
+    base_name, ext = os.path.splitext(input_path)
+    if not output_dir:
+        return f"{base_name}{suffix}{ext}"
+    relative = os.path.relpath(input_path, base_dir) if base_dir else os.path.basename(input_path)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(input_path)
+    return os.path.join(output_dir, relative)
+
+
+def is_up_to_date(input_path, output_path):
+    return (os.path.exists(output_path)
+            and os.path.getmtime(output_path) >= os.path.getmtime(input_path))
+
+
+def plan_batch(input_paths, output_dir=None, force=False):
+    """返回 (待处理的 [(input, output)]，已跳过的 [FileResult])，待处理文件按大小从大到小排列
+
+    指定 output_dir 时按各输入文件相对于它们共同上级目录的路径放入其中。
+    其他输入文件的输出文件（例如上次运行生成的 *_cropped.pdf）
+    以及 output_dir 中的文件不作为输入。
+    """
+    def normalize(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    base_dir = None
+    if output_dir and input_paths:
+        base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in input_paths])
+        input_paths = [os.path.abspath(path) for path in input_paths]
+    pairs = [(path, output_path_for(path, output_dir, base_dir)) for path in input_paths]
+
+    outputs = {normalize(output) for _, output in pairs}
+    outputs.update(normalize(output_path_for(path)) for path in input_paths)
+    excluded_dir = normalize(output_dir) + os.sep if output_dir else None
+    jobs = []
+    skipped = []
+    for input_path, output_path in pairs:
+        key = normalize(input_path)
+        if key in outputs or (excluded_dir and key.startswith(excluded_dir)):
+            continue
+        if not force and is_up_to_date(input_path, output_path):
+            skipped.append(FileResult(input_path, output_path, STATUS_SKIPPED,
+                                      input_bytes=os.path.getsize(input_path),
+                                      output_bytes=os.path.getsize(output_path)))
+        else:
+            jobs.append((input_path, output_path))
+    jobs.sort(key=lambda pair: os.path.getsize(pair[0]), reverse=True)
+    return jobs, skipped
+
+
+# 批量工作进程各自打开的内容区域缓存
+_batch_cache = None
+
+
+def _init_batch_worker(cache_dir):
+    global _batch_cache
+    if cache_dir is not None:
+        _batch_cache = BBoxCache(cache_dir or None)
+
+
+def _close_batch_cache():
+    global _batch_cache
+    if _batch_cache is not None:
+        _batch_cache.close()
+        _batch_cache = None
+
+
+def _trim_file(input_path, output_path, trim_kwargs):
+    start = time.perf_counter()
+    result = FileResult(input_path, output_path, STATUS_OK, input_bytes=os.path.getsize(input_path))
+    try:
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        report = trim_pdf(input_path, output_path, cache=_batch_cache, **trim_kwargs)
+        result.pages = report.total_pages
+        result.output_bytes = os.path.getsize(output_path)
+    except Exception as e:
+        result.status = STATUS_FAILED
+        result.error = str(e)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_batch(jobs, jobs_count=None, cache_dir=None, **trim_kwargs):
+    """按文件并行裁剪 jobs 中的 (input, output)，每完成一个文件产出一个 FileResult
+
+    jobs_count 为同时处理的文件数（默认 CPU 核心数）；多个文件并行时
+    每个文件内部默认只用一个进程分析页面，避免进程数超过核心数。
+    cache_dir 为 None 时不使用缓存，为空字符串时使用默认缓存目录。
+    其余参数传给 trim_pdf。
+    """
+    jobs_count = max(1, min(jobs_count or default_workers(), len(jobs) or 1))
+    if jobs_count > 1 and trim_kwargs.get("workers") is None:
+        trim_kwargs["workers"] = 1
+
+    if jobs_count == 1:
+        _init_batch_worker(cache_dir)
+        try:
+            for input_path, output_path in jobs:
+                yield _trim_file(input_path, output_path, trim_kwargs)
+        finally:
+            _close_batch_cache()
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs_count, initializer=_init_batch_worker,
+                             initargs=(cache_dir,)) as executor:
+        # 按提交顺序（从大到小）调度，先完成的先产出
+        futures = [executor.submit(_trim_file, input_path, output_path, trim_kwargs)
+                   for input_path, output_path in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def format_summary(results):
+    """把各文件的结果格式化为表格"""
+    lines = [f"{'状态':<8} {'页数':>6} {'耗时(s)':>9} {'输入(KB)':>10} {'输出(KB)':>10} {'减少':>8}  文件"]
+    for result in results:
+        lines.append(f"{result.status:<8} {result.pages:>6} {result.seconds:>9.2f} "
+                     f"{result.input_bytes / 1024:>10.1f} {result.output_bytes / 1024:>10.1f} "
+                     f"{result.reduction:>7.1f}%  {result.input_path}"
+                     + (f"  ({result.error})" if result.error else ""))
+    done = [result for result in results if result.status == STATUS_OK]
+    pages = sum(result.pages for result in done)
+    seconds = sum(result.seconds for result in done)
+    failed = sum(1 for result in results if result.status == STATUS_FAILED)
+    skipped = sum(1 for result in results if result.status == STATUS_SKIPPED)
+    lines.append(f"完成 {len(done)} 个文件（{pages} 页，累计 {seconds:.1f} 秒），"
+                 f"跳过 {skipped} 个，失败 {failed} 个")
+    return "\n".join(lines)
+
+
+def write_report(results, path):
+    """保存各文件的结果，扩展名为 .csv 时保存为 CSV，否则保存为 JSON"""
+    rows = [dict(asdict(result), reduction=round(result.reduction, 2)) for result in results]
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["input_path"])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,527 @@
+"""PDF白边裁剪性能测试
+
+子命令：
+    scan   对比 full 与 edges 两种像素扫描方式在不同白边宽度页面上的耗时
+    emit   对比 embed 与 cropbox 两种输出方式的耗时与输出大小
+    suite  在本地生成的合成文档集上测试各裁剪入口与检测方式，
+           输出每秒页数、峰值内存与输出大小，结果保存为 JSON 以便跨提交比较
+    gray   检查灰度渲染与 RGB 渲染检测出的内容区域是否相差不超过一个像素，并对比耗时；
+           浅色与细线组成的 faint 文档只报告已知差异
+    memory 同类文档取不同页数，对比整页渲染与分条渲染的峰值内存是否随页数增长
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz
+import pdf_bbox
+from pdf_bbox import find_ink_bbox, SCAN_MODES
+from pdf_trim_core import (analyze_document, plan_crop, make_emitter, trim_pdf, detect_page, page_dpi,
+                           AnalysisOptions, DETECTORS, DETECTOR_RASTER, EMIT_MODES)
+
+
+def make_margin_page(doc, margin, width=595, height=842):
+    """生成内容占满页面、四周留 margin 磅白边的页面"""
+    page = doc.new_page(width=width, height=height)
+    page.draw_rect(fitz.Rect(margin, margin, width - margin, height - margin),
+                   color=None, fill=(0.2, 0.2, 0.2))
+    return page
+
+
+def make_text_document(path, pages):
+    """生成带书签和页内链接的文字页面文档"""
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        for line in range(30):
+            page.insert_text((72, 90 + line * 20), f"page {page_num + 1} line {line + 1} " + "text " * 12,
+                             fontsize=9)
+        if page_num:
+            page.insert_link({"kind": fitz.LINK_GOTO, "from": fitz.Rect(72, 720, 200, 740),
+                              "page": page_num - 1})
+    doc.set_toc([[1, f"第 {page_num + 1} 页", page_num + 1] for page_num in range(0, pages, 10)])
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+# 合成文档的页面尺寸（磅），mixed 文档按顺序循环使用
+PAGE_SIZES = [(595, 842), (612, 792), (842, 1191), (842, 595), (420, 595)]
+CORPUS_KINDS = ("text", "image", "blank", "mixed")
+
+
+def _add_text_page(doc, page_num, width=595, height=842):
+    page = doc.new_page(width=width, height=height)
+    for line in range(min(30, int((height - 144) // 20))):
+        page.insert_text((72, 90 + line * 20), f"page {page_num + 1} line {line + 1} " + "text " * 8,
+                         fontsize=9)
+    return page
+
+
+def _make_images(rng, count=8, width=320, height=240):
+    """生成若干张随机噪声图像（不可压缩，接近照片的大小）"""
+    return [fitz.Pixmap(fitz.csRGB, width, height, rng.randbytes(width * height * 3), False)
+            for _ in range(count)]
+
+
+def make_corpus_document(path, kind, pages, seed=0):
+    """生成 kind 类型的 pages 页合成文档
+
+    text  —— 每页 30 行文字；
+    image —— 每页两张图像加一行说明，图像在页内的位置随机；
+    blank —— 空白页；
+    mixed —— 文字、图像、空白页交替，页面尺寸在 PAGE_SIZES 中循环。
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    images = _make_images(rng) if kind in ("image", "mixed") else []
+    image_xrefs = {}
+
+    def add_image_page(page_num, width=595, height=842):
+        page = doc.new_page(width=width, height=height)
+        for slot in range(2):
+            index = rng.randrange(len(images))
+            x = rng.uniform(36, width - 300)
+            y = rng.uniform(36 + slot * (height / 2 - 36), height / 2 - 200 + slot * (height / 2 - 36))
+            rect = fitz.Rect(x, y, x + 260, y + 195)
+            # 同一张图像只嵌入一次，之后按 xref 引用
+            if index in image_xrefs:
+                page.insert_image(rect, xref=image_xrefs[index])
+            else:
+                image_xrefs[index] = page.insert_image(rect, pixmap=images[index])
+        page.insert_text((72, height - 40), f"figure {page_num + 1}", fontsize=9)
+
+    for page_num in range(pages):
+        if kind == "text":
+            _add_text_page(doc, page_num)
+        elif kind == "image":
+            add_image_page(page_num)
+        elif kind == "blank":
+            doc.new_page()
+        elif kind == "mixed":
+            width, height = PAGE_SIZES[page_num % len(PAGE_SIZES)]
+            choice = page_num % 3
+            if choice == 0:
+                _add_text_page(doc, page_num, width, height)
+            elif choice == 1:
+                add_image_page(page_num, width, height)
+            else:
+                doc.new_page(width=width, height=height)
+        else:
+            raise ValueError(f"未知的文档类型: {kind}")
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def make_color_document(path, pages, seed=0, faint=False):
+    """生成随机彩色文字、色块与线条的页面，用于比较灰度与 RGB 检测
+
+    faint 为假时颜色各通道取 0~0.6（深色或饱和色），线宽不小于 0.5 磅；
+    为真时取 0.75~1 的浅色并使用细至 0.2 磅的线条，再加入接近白色的背景块。
+    这类内容渲染后的亮度与三通道平均值可能落在阈值两侧。
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    low, high = (0.75, 1.0) if faint else (0.0, 0.6)
+
+    def color():
+        return tuple(rng.uniform(low, high) for _ in range(3))
+
+    for page_num in range(pages):
+        page = doc.new_page()
+        if faint and rng.random() < 0.5:
+            x, y = rng.uniform(0, 300), rng.uniform(0, 500)
+            page.draw_rect(fitz.Rect(x, y, x + 250, y + 300), color=None,
+                           fill=tuple(rng.uniform(0.85, 1) for _ in range(3)))
+        for _ in range(rng.randint(3, 12)):
+            page.insert_text((rng.uniform(20, 450), rng.uniform(30, 820)), "colored text",
+                             fontsize=rng.uniform(4, 14), color=color())
+        for _ in range(rng.randint(1, 6)):
+            x, y = rng.uniform(10, 500), rng.uniform(10, 750)
+            page.draw_rect(fitz.Rect(x, y, x + rng.uniform(5, 80), y + rng.uniform(5, 80)),
+                           color=None, fill=color())
+        page.draw_line((rng.uniform(5, 100), rng.uniform(5, 837)), (rng.uniform(400, 590), rng.uniform(5, 837)),
+                       color=color(), width=rng.uniform(0.2 if faint else 0.5, 1.5))
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def peak_rss_kb():
+    """返回本进程及已结束子进程的峰值常驻内存(KB)，无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset // 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def time_call(func, repeat):
+    """返回 func 多次调用中最短的一次耗时(秒)与其结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_scan(args):
+    if args.pure_python:
+        pdf_bbox.np = None
+    backend = "numpy" if pdf_bbox.np is not None else "纯Python"
+    print(f"像素扫描对比（{backend}，{args.dpi:g} dpi，取 {args.repeat} 次最短耗时）")
+
+    doc = fitz.open()
+    zoom = args.dpi / 72
+    print(f"{'白边(磅)':>8} {'像素数':>10} " + " ".join(f"{mode + '(ms)':>10}" for mode in SCAN_MODES) + f" {'加速比':>8}")
+    for margin in args.margins:
+        page = make_margin_page(doc, margin)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        timings = {}
+        results = set()
+        for mode in SCAN_MODES:
+            elapsed, bbox = time_call(lambda: find_ink_bbox(pix, args.threshold, mode), args.repeat)
+            timings[mode] = elapsed
+            results.add(bbox)
+        if len(results) != 1:
+            raise RuntimeError(f"扫描结果不一致: {results}")
+        speedup = timings["full"] / timings["edges"] if timings["edges"] else float("inf")
+        print(f"{margin:>8g} {pix.width * pix.height:>10} "
+              + " ".join(f"{timings[mode] * 1000:>10.3f}" for mode in SCAN_MODES)
+              + f" {speedup:>8.2f}")
+    doc.close()
+
+
+def bench_emit(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "input.pdf")
+        make_text_document(input_path, args.pages)
+        input_size = os.path.getsize(input_path)
+
+        doc = fitz.open(input_path)
+        crop_boxes = [plan_crop(doc.load_page(page_num).rect, rect)
+                      for page_num, rect, _ in analyze_document(doc, input_path, workers=1)]
+
+        print(f"输出方式对比（{args.pages} 页，输入 {input_size / 1024:.1f} KB）")
+        print(f"{'方式':>8} {'耗时(s)':>10} {'输出(KB)':>10} {'链接数':>8}")
+        for mode in EMIT_MODES:
+            output_path = os.path.join(tmp_dir, f"{mode}.pdf")
+            start = time.perf_counter()
+            emitter = make_emitter(doc, input_path, output_path, mode)
+            for page_num, crop_box in enumerate(crop_boxes):
+                emitter.add(page_num, crop_box)
+            emitter.finish()
+            elapsed = time.perf_counter() - start
+
+            output = fitz.open(output_path)
+            links = sum(len(page.get_links()) for page in output)
+            output.close()
+            print(f"{mode:>8} {elapsed:>10.3f} {os.path.getsize(output_path) / 1024:>10.1f} {links:>8}")
+        doc.close()
+
+
+# 各裁剪入口支持的检测方式；vertical 只接受阈值参数，固定使用像素检测
+ENTRY_DETECTORS = {
+    "trim_pdf": DETECTORS,
+    "crop_pdf": DETECTORS,
+    "vertical": (DETECTOR_RASTER,),
+}
+
+
+def run_case(args):
+    """在独立进程中执行一次裁剪，把耗时与峰值内存写入 args.result"""
+    options = AnalysisOptions(detector=args.detector, precision=args.precision, coarse_dpi=args.coarse_dpi,
+                              band_megapixels=args.band_megapixels)
+    start = time.perf_counter()
+    if args.entry == "trim_pdf":
+        trim_pdf(args.input, args.output, options, workers=args.workers, flush_every=args.flush_every or None)
+    elif args.entry == "crop_pdf":
+        from pdf_trim_tool import crop_pdf
+        if not crop_pdf(args.input, args.output, workers=args.workers, options=options):
+            raise RuntimeError("crop_pdf 处理失败")
+    else:
+        from pdf_trim_tool_vertical import crop_pdf
+        if not crop_pdf(args.input, args.output, workers=args.workers):
+            raise RuntimeError("crop_pdf 处理失败")
+    elapsed = time.perf_counter() - start
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump({"seconds": elapsed, "peak_rss_kb": peak_rss_kb()}, f)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _case_key(result):
+    return result["kind"], result["pages"], result["entry"], result["detector"]
+
+
+def bench_suite(args):
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="trim_corpus_")
+    os.makedirs(corpus_dir, exist_ok=True)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {_case_key(result): result for result in json.load(f)["results"]}
+
+    results = []
+    print(f"{'文档':>12} {'入口':>9} {'检测':>7} {'耗时(s)':>9} {'页/秒':>9} {'峰值内存(MB)':>12} {'输出(KB)':>10}"
+          + (f" {'对比基线':>8}" if baseline else ""))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in args.kinds:
+            for pages in args.pages:
+                input_path = os.path.join(corpus_dir, f"{kind}_{pages}.pdf")
+                if not os.path.exists(input_path):
+                    make_corpus_document(input_path, kind, pages)
+                for entry in args.entries:
+                    for detector in args.detectors:
+                        if detector not in ENTRY_DETECTORS[entry]:
+                            continue
+                        output_path = os.path.join(tmp_dir, "output.pdf")
+                        result_path = os.path.join(tmp_dir, "result.json")
+                        # 每项在新进程中运行，峰值内存互不影响
+                        command = [sys.executable, os.path.abspath(__file__), "run-case",
+                                   "--entry", entry, "--detector", detector, "--input", input_path,
+                                   "--output", output_path, "--result", result_path]
+                        if args.workers is not None:
+                            command += ["--workers", str(args.workers)]
+                        completed = subprocess.run(command, capture_output=True, text=True)
+                        if completed.returncode != 0:
+                            raise RuntimeError(f"{kind}_{pages} {entry}/{detector} 运行失败:\n{completed.stderr}")
+                        with open(result_path, encoding="utf-8") as f:
+                            measured = json.load(f)
+
+                        result = {
+                            "kind": kind,
+                            "pages": pages,
+                            "entry": entry,
+                            "detector": detector,
+                            "seconds": round(measured["seconds"], 4),
+                            "pages_per_sec": round(pages / measured["seconds"], 2) if measured["seconds"] else None,
+                            "peak_rss_kb": measured["peak_rss_kb"],
+                            "input_bytes": os.path.getsize(input_path),
+                            "output_bytes": os.path.getsize(output_path),
+                        }
+                        results.append(result)
+
+                        rss = f"{result['peak_rss_kb'] / 1024:.1f}" if result["peak_rss_kb"] else "-"
+                        line = (f"{kind + '_' + str(pages):>12} {entry:>9} {detector:>7} {result['seconds']:>9.3f} "
+                                f"{result['pages_per_sec'] or 0:>9.1f} {rss:>12} {result['output_bytes'] / 1024:>10.1f}")
+                        old = baseline.get(_case_key(result))
+                        if old:
+                            line += f" {old['seconds'] / result['seconds']:>7.2f}x"
+                        print(line)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "numpy": pdf_bbox.np.__version__ if pdf_bbox.np is not None else None,
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "results": results,
+    }
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存至: {args.json}")
+
+
+def bench_gray(args):
+    """逐页比较灰度与 RGB 渲染的检测结果，差异以本页检测分辨率下的像素计
+
+    灰度渲染按亮度（0.3R + 0.59G + 0.11B）判断，RGB 按三通道平均值判断，
+    亮度与平均值落在阈值两侧的浅色与细线会被不同地保留或忽略，没有一个灰度阈值能使两者一致，
+    这也是灰度渲染默认不启用的原因。faint 文档由这类内容组成，只报告差异，不参与判断；
+    其余文档（包括命令行给出的文件）有页面相差超过一个像素时以非零状态退出。
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # (路径, 是否参与判断)
+        documents = [(path, True) for path in args.inputs]
+        if not documents:
+            for name, make in (("color.pdf", lambda path: make_color_document(path, args.pages)),
+                               ("mixed.pdf", lambda path: make_corpus_document(path, "mixed", args.pages)),
+                               ("faint.pdf", lambda path: make_color_document(path, args.pages, faint=True))):
+                path = os.path.join(tmp_dir, name)
+                make(path)
+                documents.append((path, name != "faint.pdf"))
+
+        print(f"灰度与 RGB 渲染对比（{args.dpi:g} dpi，粗检测 {args.coarse_dpi:g} dpi）")
+        print(f"{'文档':>12} {'页数':>6} {'最大差(像素)':>12} {'超过1像素':>10} {'RGB(s)':>9} {'灰度(s)':>9} {'加速比':>8}")
+        failed = False
+        for path, required in documents:
+            doc = fitz.open(path)
+            timings = {}
+            rects = {}
+            for grayscale in (False, True):
+                options = AnalysisOptions(dpi=args.dpi, coarse_dpi=args.coarse_dpi, grayscale=grayscale)
+                start = time.perf_counter()
+                rects[grayscale] = [detect_page(page, options)[0] for page in doc]
+                timings[grayscale] = time.perf_counter() - start
+
+            worst = 0.0
+            over = 0
+            for page, rgb_rect, gray_rect in zip(doc, rects[False], rects[True]):
+                if (rgb_rect is None) != (gray_rect is None):
+                    diff = float("inf")
+                elif rgb_rect is None:
+                    diff = 0.0
+                else:
+                    # 换算为本页实际检测分辨率下的像素
+                    pixel = 72 / page_dpi(page.rect, AnalysisOptions(dpi=args.dpi))[0]
+                    diff = max(abs(a - b) for a, b in zip(rgb_rect, gray_rect)) / pixel
+                worst = max(worst, diff)
+                if diff > 1 + 1e-6:
+                    over += 1
+            failed = failed or (required and over > 0)
+            print(f"{os.path.basename(path):>12} {len(doc):>6} {worst:>12.2f} {over:>10} "
+                  f"{timings[False]:>9.3f} {timings[True]:>9.3f} {timings[False] / timings[True]:>8.2f}"
+                  + ("" if required else "  （浅色与细线的已知差异，不参与判断）"))
+            doc.close()
+    if failed:
+        raise SystemExit("灰度渲染支持的文档中存在差异超过一个像素的页面")
+
+
+def bench_memory(args):
+    """同一类文档取不同页数，分别在新进程中流式裁剪并记录峰值内存，检查内存是否随页数增长
+
+    最少页数到最多页数的峰值内存增加超过 --max-growth 时以非零状态退出。
+    """
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="trim_corpus_")
+    os.makedirs(corpus_dir, exist_ok=True)
+    # 整页检测（不做两阶段检测），位图大小由精度与条带上限决定
+    print(f"峰值内存测试（{args.kind}，整页检测，精度 {args.precision:g} 磅，{args.workers} 个工作进程，"
+          f"每 {args.flush_every} 页写出一个分块）")
+    print(f"{'页数':>6} {'条带(MP)':>9} {'耗时(s)':>9} {'峰值内存(MB)':>12}")
+    peaks = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            input_path = os.path.join(corpus_dir, f"{args.kind}_{pages}.pdf")
+            if not os.path.exists(input_path):
+                make_corpus_document(input_path, args.kind, pages)
+            for band in args.band_megapixels:
+                result_path = os.path.join(tmp_dir, "result.json")
+                command = [sys.executable, os.path.abspath(__file__), "run-case",
+                           "--entry", "trim_pdf", "--detector", DETECTOR_RASTER, "--input", input_path,
+                           "--output", os.path.join(tmp_dir, "output.pdf"), "--result", result_path,
+                           "--workers", str(args.workers), "--precision", str(args.precision), "--coarse-dpi", "0",
+                           "--band-megapixels", str(band), "--flush-every", str(args.flush_every)]
+                completed = subprocess.run(command, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    raise RuntimeError(f"{args.kind}_{pages} 条带 {band:g} 运行失败:\n{completed.stderr}")
+                with open(result_path, encoding="utf-8") as f:
+                    measured = json.load(f)
+                rss = measured["peak_rss_kb"]
+                peaks.setdefault(band, []).append(rss)
+                print(f"{pages:>6} {band:>9g} {measured['seconds']:>9.2f} "
+                      f"{rss / 1024 if rss else 0:>12.1f}")
+
+    failed = False
+    for band, values in peaks.items():
+        if None in values:
+            continue
+        growth = (values[-1] - values[0]) / 1024
+        print(f"条带 {band:g} MP：{args.pages[0]} 页到 {args.pages[-1]} 页峰值内存增加 {growth:.1f} MB")
+        failed = failed or growth > args.max_growth
+    if failed:
+        print(f"峰值内存增加超过 {args.max_growth:g} MB")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF白边裁剪性能测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan_parser = subparsers.add_parser('scan', help='对比 full 与 edges 两种像素扫描方式')
+    scan_parser.add_argument('--margins', type=float, nargs='+', default=[2, 10, 36, 72, 200],
+                             help='测试页面的白边宽度(磅)，默认为 2 10 36 72 200')
+    scan_parser.add_argument('--dpi', type=float, default=150, help='渲染分辨率，默认为150')
+    scan_parser.add_argument('-t', '--threshold', type=float, default=0.1, help='内容检测阈值，默认为0.1')
+    scan_parser.add_argument('--repeat', type=int, default=5, help='每项重复次数，默认为5')
+    scan_parser.add_argument('--pure-python', action='store_true', help='不使用 numpy，测试纯 Python 实现')
+    scan_parser.set_defaults(func=bench_scan)
+
+    emit_parser = subparsers.add_parser('emit', help='对比 embed 与 cropbox 两种输出方式')
+    emit_parser.add_argument('--pages', type=int, default=500, help='测试文档页数，默认为500')
+    emit_parser.set_defaults(func=bench_emit)
+
+    suite_parser = subparsers.add_parser('suite', help='在合成文档集上测试各裁剪入口与检测方式')
+    suite_parser.add_argument('--kinds', nargs='+', choices=CORPUS_KINDS, default=list(CORPUS_KINDS),
+                              help='合成文档类型，默认为全部')
+    suite_parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000],
+                              help='合成文档页数，默认为 10 100 1000，大文件测试可加 5000')
+    suite_parser.add_argument('--entries', nargs='+', choices=list(ENTRY_DETECTORS), default=list(ENTRY_DETECTORS),
+                              help='测试的裁剪入口：trim_pdf 核心函数，crop_pdf 命令行工具，'
+                                   'vertical 可选垂直裁剪的工具。默认为全部')
+    suite_parser.add_argument('--detectors', nargs='+', choices=DETECTORS, default=list(DETECTORS),
+                              help='测试的检测方式，默认为全部')
+    suite_parser.add_argument('-w', '--workers', type=int, default=None,
+                              help='页面分析的工作进程数，默认为CPU核心数')
+    suite_parser.add_argument('--corpus-dir', help='合成文档目录，已存在的文档直接复用，默认为临时目录')
+    suite_parser.add_argument('--json', default='trim_benchmark.json', help='结果文件，默认为trim_benchmark.json')
+    suite_parser.add_argument('--baseline', help='以前保存的结果文件，输出相对它的加速比')
+    suite_parser.set_defaults(func=bench_suite)
+
+    gray_parser = subparsers.add_parser('gray', help='检查灰度渲染与 RGB 渲染的检测结果是否一致')
+    gray_parser.add_argument('inputs', nargs='*', help='要比较的PDF文件，默认为生成的彩色文档与混合文档')
+    gray_parser.add_argument('--pages', type=int, default=200, help='生成文档的页数，默认为200')
+    gray_parser.add_argument('--dpi', type=float, default=72, help='检测分辨率，默认为72')
+    gray_parser.add_argument('--coarse-dpi', type=float, default=18, help='粗检测分辨率，0表示整页检测，默认为18')
+    gray_parser.set_defaults(func=bench_gray)
+
+    memory_parser = subparsers.add_parser('memory', help='测试峰值内存是否随页数增长')
+    memory_parser.add_argument('--kind', choices=CORPUS_KINDS, default='mixed', help='合成文档类型，默认为mixed')
+    memory_parser.add_argument('--pages', type=int, nargs='+', default=[100, 400, 1000],
+                               help='合成文档页数，默认为 100 400 1000；页数过少时各项缓存尚未达到上限，不宜作为起点')
+    memory_parser.add_argument('--precision', type=float, default=0.2,
+                               help='内容边界精度(磅)，默认为0.2（360 dpi），使每页的位图足够大')
+    memory_parser.add_argument('--band-megapixels', type=float, nargs='+', default=[0, AnalysisOptions.band_megapixels],
+                               help=f'对比的条带像素上限(百万)，0表示整页一次渲染，'
+                                    f'默认为 0 {AnalysisOptions.band_megapixels:g}')
+    memory_parser.add_argument('-w', '--workers', type=int, default=1, help='页面分析的工作进程数，默认为1')
+    memory_parser.add_argument('--flush-every', type=int, default=50,
+                               help='流式输出时每个分块的页数，0表示不分块，默认为50')
+    memory_parser.add_argument('--max-growth', type=float, default=8,
+                               help='允许的峰值内存增加(MB)，超过时以非零状态退出，默认为8')
+    memory_parser.add_argument('--corpus-dir', help='合成文档目录，已存在的文档直接复用，默认为临时目录')
+    memory_parser.set_defaults(func=bench_memory)
+
+    case_parser = subparsers.add_parser('run-case', help=argparse.SUPPRESS)
+    case_parser.add_argument('--entry', choices=list(ENTRY_DETECTORS), required=True)
+    case_parser.add_argument('--detector', choices=DETECTORS, required=True)
+    case_parser.add_argument('--input', required=True)
+    case_parser.add_argument('--output', required=True)
+    case_parser.add_argument('--result', required=True)
+    case_parser.add_argument('-w', '--workers', type=int, default=None)
+    case_parser.add_argument('--precision', type=float, default=AnalysisOptions.precision)
+    case_parser.add_argument('--coarse-dpi', type=float, default=AnalysisOptions.coarse_dpi)
+    case_parser.add_argument('--band-megapixels', type=float, default=AnalysisOptions.band_megapixels)
+    case_parser.add_argument('--flush-every', type=int, default=0)
+    case_parser.set_defaults(func=run_case)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
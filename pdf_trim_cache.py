@@ -0,0 +1,121 @@
+"""PDF白边裁剪的内容区域缓存
+
+以页面内容（内容流、资源、注释、页面框与旋转）的哈希加上检测参数作为键，
+把检测出的内容区域保存在 sqlite 数据库中。重复裁剪同一文件时，
+只改变安全边距或裁剪方向就无需再次渲染页面。缓存按最近使用时间淘汰。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# 检测算法变化导致旧结果失效时递增
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 200000
+
+# 只影响渲染与扫描方式、不改变检测结果的分析参数，不计入缓存键
+RESULT_NEUTRAL_OPTIONS = ("scan", "band_megapixels")
+
+
+def default_cache_dir():
+    """默认缓存目录：Windows 下为 %LOCALAPPDATA%，其他系统为 ~/.cache"""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "office2pdf", "trim_cache")
+
+
+def _update_stream(hasher, doc, xref):
+    if xref and doc.xref_is_stream(xref):
+        hasher.update(doc.xref_stream_raw(xref))
+
+
+def page_fingerprint(doc, page):
+    """计算决定页面渲染结果的内容的哈希值
+
+    只取资源的内容而不取其对象编号，因此同一文档中模板相同、
+    各自带一份相同资源的页面得到相同的指纹。
+    """
+    hasher = hashlib.sha256()
+    hasher.update(repr((tuple(page.mediabox), tuple(page.cropbox), page.rotation)).encode())
+
+    for xref in page.get_contents():
+        hasher.update(doc.xref_stream_raw(xref))
+
+    # 字体取名称与类型（字形一般不影响内容边界），图像与表单取完整数据
+    for xref, ext, font_type, basefont, name, encoding, *_ in page.get_fonts():
+        hasher.update(repr((ext, font_type, basefont, name, encoding)).encode("utf-8", "replace"))
+    for xref, smask, width, height, bpc, colorspace, alt_colorspace, name, *_ in page.get_images(full=True):
+        hasher.update(repr((width, height, bpc, colorspace, alt_colorspace, name)).encode("utf-8", "replace"))
+        _update_stream(hasher, doc, xref)
+        _update_stream(hasher, doc, smask)
+    for xref, name, invoker, bbox in page.get_xobjects():
+        hasher.update(repr((name, tuple(bbox))).encode("utf-8", "replace"))
+        _update_stream(hasher, doc, xref)
+
+    # 注释的外观也会被渲染
+    for xref, *_ in page.annot_xrefs():
+        hasher.update(repr(doc.xref_get_key(xref, "Rect")).encode())
+        ap_type, ap_value = doc.xref_get_key(xref, "AP/N")
+        if ap_type == "xref":
+            _update_stream(hasher, doc, int(ap_value.split()[0]))
+
+    return hasher.hexdigest()
+
+
+class BBoxCache:
+    """基于 sqlite 的内容区域缓存，条目数超过 max_entries 时淘汰最久未使用的条目"""
+
+    def __init__(self, cache_dir=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_entries = max_entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, "bbox_cache.sqlite3"), timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS bbox ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, used REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bbox_used ON bbox (used)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(fingerprint, options):
+        """由页面指纹与影响检测结果的参数生成缓存键"""
+        fields = sorted((name, value) for name, value in vars(options).items()
+                        if name not in RESULT_NEUTRAL_OPTIONS)
+        text = f"{CACHE_VERSION}|{fingerprint}|{fields!r}"
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get_many(self, keys):
+        """批量查询，返回 {key: (content_rect, detector)}，并刷新命中条目的使用时间"""
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key, value FROM bbox WHERE key IN ({placeholders})", batch)
+            for key, value in rows:
+                rect, detector = json.loads(value)
+                found[key] = (tuple(rect) if rect is not None else None, detector)
+        if found:
+            now = time.time()
+            self.conn.executemany("UPDATE bbox SET used = ? WHERE key = ?",
+                                  [(now, key) for key in found])
+            self.conn.commit()
+        return found
+
+    def put_many(self, items):
+        """批量写入 [(key, content_rect, detector)]，并按最近使用时间淘汰多余条目"""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO bbox (key, value, used) VALUES (?, ?, ?)",
+            [(key, json.dumps([list(rect) if rect is not None else None, detector]), now)
+             for key, rect, detector in items])
+        count = self.conn.execute("SELECT COUNT(*) FROM bbox").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM bbox WHERE key IN "
+                "(SELECT key FROM bbox ORDER BY used LIMIT ?)", (count - self.max_entries,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
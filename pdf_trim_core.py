@@ -0,0 +1,1103 @@
+"""PDF白边裁剪核心模块
+
+命令行与 PyQt 各版本裁剪工具共用的裁剪引擎，分为三个阶段：
+页面分析（检测内容区域）、裁剪规划（安全边距与裁剪方向）、文档输出（复制页面与书签）。
+"""
+import hashlib
+import math
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import Counter, deque
+from dataclasses import dataclass, field, replace
+
+import fitz
+from pdf_bbox import find_ink_bbox, SCAN_EDGES
+from pdf_trim_cache import page_fingerprint
+from pdf_trim_profile import stage, current_profiler, StageProfiler
+
+# 裁剪方向
+AXIS_BOTH = "both"              # 裁剪上下左右四边
+AXIS_HORIZONTAL = "horizontal"  # 只裁剪左右白边
+AXIS_VERTICAL = "vertical"      # 只裁剪上下白边
+AXIS_MODES = (AXIS_BOTH, AXIS_HORIZONTAL, AXIS_VERTICAL)
+
+# 统一裁剪范围
+UNIFORM_PAGE = "page"          # 每页按各自的内容区域裁剪
+UNIFORM_DOCUMENT = "document"  # 整个文档使用同一个裁剪框
+UNIFORM_CHAPTER = "chapter"    # 按一级书签划分章节，每章使用同一个裁剪框
+UNIFORM_MODES = (UNIFORM_PAGE, UNIFORM_DOCUMENT, UNIFORM_CHAPTER)
+
+# 输出方式
+EMIT_EMBED = "embed"      # 新建页面，用 show_pdf_page 把原页面作为 Form XObject 嵌入
+EMIT_CROPBOX = "cropbox"  # 在原文档副本上直接修改每页的 CropBox
+EMIT_MODES = (EMIT_EMBED, EMIT_CROPBOX)
+
+# 内容检测方式
+DETECTOR_RASTER = "raster"  # 渲染为位图后按像素检测
+DETECTOR_VECTOR = "vector"  # 根据文字、路径、图像的几何信息计算，不渲染
+DETECTOR_AUTO = "auto"      # 优先按几何信息，以图像为主的页面改用位图检测
+DETECTORS = (DETECTOR_RASTER, DETECTOR_VECTOR, DETECTOR_AUTO)
+
+# 图像面积占页面面积超过该比例时，auto 模式改用位图检测
+IMAGE_DOMINANT_RATIO = 0.5
+
+# 粗检测分辨率为 0 时缩略图使用的分辨率
+THUMBNAIL_DPI = 18
+
+# 分条渲染累计的位图字节数超过该值时清空 MuPDF 全局缓存
+STRIP_STORE_BUDGET = 256 * 1024 * 1024
+
+# 本进程自上次清空缓存以来分条渲染的位图字节数
+_strip_store_bytes = 0
+
+# 逐页读取输入文件时，每读取这么多页重新打开一次文档
+REOPEN_PAGES = 256
+
+# analyze_document 每次计算指纹、查询缓存的页数，第一批页面分析完即可开始输出
+FINGERPRINT_WINDOW = 64
+
+
+@dataclass(frozen=True)
+class AnalysisOptions:
+    """页面分析参数，需要可以被 pickle 以便传给工作进程"""
+    threshold: float = 0.1     # 内容检测阈值(0-1)，值越小越严格
+    dpi: float = 72            # 内容边界的检测分辨率
+    coarse_dpi: float = 18     # 粗检测分辨率，为 0 时整页按 dpi 渲染检测（见 _analyze_two_stage 的精度说明）
+    refine_band: float = 12.0  # 精细检测时粗略边界两侧额外渲染的宽度(磅)
+    detector: str = DETECTOR_RASTER  # 内容检测方式，见 DETECTORS
+    scan: str = SCAN_EDGES     # 像素扫描方式，见 pdf_bbox.SCAN_MODES
+    precision: float = 0.0     # 内容边界的精度(磅)，非 0 时按它决定分辨率（72 / precision），代替 dpi
+    max_megapixels: float = 16.0  # 每次渲染的像素上限(百万)，大幅面页面自动降低分辨率；0 表示不限制
+    band_megapixels: float = 1.0  # 整页检测时每条横向条带的像素上限(百万)，超过时分条渲染；0 表示整页一次渲染
+    grayscale: bool = False    # 渲染为单通道灰度图（按亮度判断，浅色内容的结果与默认的 RGB 三通道平均值不同）
+    min_density: float = 0.0   # 抗噪：一行（列）中内容像素的最低比例(0-1)，0 表示不过滤
+    min_run: float = 0.0       # 抗噪：内容边界至少连续的宽度(磅)，0 表示不过滤
+
+    @property
+    def filters_noise(self):
+        return self.min_density > 0 or self.min_run > 0
+
+
+def _render(page, dpi, clip=None, grayscale=False):
+    """按指定分辨率渲染页面（或页面的一部分），page 也可以是页面的 DisplayList
+
+    grayscale 为真时直接渲染为不带 alpha 的单通道灰度图，内存与扫描的数据量只有 RGB 的三分之一，
+    也省去了逐像素求 (r + g + b) // 3 的换算；但 MuPDF 按亮度换算灰度，
+    浅色与彩色内容的判断与三通道平均值不同，因此默认仍按 RGB 渲染。
+    """
+    zoom = dpi / 72
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    with stage("render"):
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=colorspace, alpha=False)
+
+
+def _scan(pix, threshold, options, dpi=None):
+    """扫描内容边界；给出 dpi 时按 options 的抗噪参数过滤（min_run 按 dpi 换算为像素）"""
+    with stage("scan"):
+        if dpi is None or not options.filters_noise:
+            return find_ink_bbox(pix, threshold, options.scan)
+        min_run = max(1, round(options.min_run * dpi / 72))
+        return find_ink_bbox(pix, threshold, options.scan, options.min_density, min_run)
+
+
+def _pixel_to_pdf(mediabox, bbox, width, height):
+    """把 width x height 整页像素网格中的边界 (left, top, right, bottom) 转换为PDF坐标"""
+    left, top, right, bottom = bbox
+    x0 = mediabox.x0 + left * (mediabox.x1 - mediabox.x0) / width
+    y0 = mediabox.y0 + top * (mediabox.y1 - mediabox.y0) / height
+    x1 = mediabox.x0 + right * (mediabox.x1 - mediabox.x0) / width
+    y1 = mediabox.y0 + bottom * (mediabox.y1 - mediabox.y0) / height
+    return fitz.Rect(x0, y0, x1, y1)
+
+
+def _analyze_full(page, options):
+    """整页按 options.dpi 渲染并检测内容区域，像素数超过 band_megapixels 时分条渲染"""
+    mediabox = page.rect
+    zoom = options.dpi / 72
+    full = (mediabox * fitz.Matrix(zoom, zoom)).irect
+    # 抗噪过滤需要整页的行/列投影，不分条
+    if (options.band_megapixels and not options.filters_noise
+            and full.width * full.height > options.band_megapixels * 1e6):
+        return _analyze_strips(page, options, full)
+
+    pix = _render(page, options.dpi, grayscale=options.grayscale)
+    bbox = _scan(pix, options.threshold, options, options.dpi)
+    if bbox is None:
+        return None
+    # 将像素坐标转换为PDF坐标
+    return _pixel_to_pdf(mediabox, bbox, pix.width, pix.height)
+
+
+def _analyze_strips(page, options, full):
+    """把整页分成不超过 band_megapixels 的横向条带依次渲染、扫描，合并各条带的内容边界
+
+    full 为整页按 options.dpi 渲染时的像素范围。页面先转换为 DisplayList，
+    内容流只解析一次，每个条带只做光栅化；同一时刻只有一个条带的 pixmap，
+    因此单页的渲染内存不再随页面大小与分辨率增长。
+    """
+    global _strip_store_bytes
+    mediabox = page.rect
+    zoom = options.dpi / 72
+    rows = max(1, int(options.band_megapixels * 1e6 // full.width))
+    with stage("render"):
+        display_list = page.get_displaylist()
+
+    left = top = right = bottom = None
+    for y in range(full.y0, full.y1, rows):
+        clip = fitz.Rect(mediabox.x0, mediabox.y0 + y / zoom,
+                         mediabox.x1, mediabox.y0 + min(y + rows, full.y1) / zoom)
+        pix = _render(display_list, options.dpi, clip, options.grayscale)
+        _strip_store_bytes += pix.stride * pix.height
+        bbox = _scan(pix, options.threshold, options)
+        if bbox is None:
+            continue
+        # 条带的像素坐标加上条带在整页中的偏移
+        strip_left, strip_top, strip_right, strip_bottom = bbox
+        strip_left += pix.x - full.x0
+        strip_right += pix.x - full.x0
+        if top is None:
+            top = pix.y - full.y0 + strip_top
+            left, right = strip_left, strip_right
+        else:
+            left = min(left, strip_left)
+            right = max(right, strip_right)
+        bottom = pix.y - full.y0 + strip_bottom
+    # 分条光栅化时 MuPDF 按条带分别解码图像的局部并放入全局缓存，这些缓存只对本页有用，
+    # 不清空会使常驻内存随页数增长（最多到缓存上限 256MB）。PyMuPDF 无法查询缓存大小，
+    # 按分条渲染的数据量估计，超过 STRIP_STORE_BUDGET 才清空，其余时候保留共享的字体与图像
+    if _strip_store_bytes > STRIP_STORE_BUDGET:
+        fitz.TOOLS.store_shrink(100)
+        _strip_store_bytes = 0
+    if top is None:
+        return None
+    return _pixel_to_pdf(mediabox, (left, top, right, bottom), full.width, full.height)
+
+
+def _analyze_band(page, clip, options):
+    """按 options.dpi 渲染边缘条带，返回其中内容的PDF坐标，没有内容时返回 None"""
+    clip = clip & page.rect
+    if clip.is_empty:
+        return None
+    pix = _render(page, options.dpi, clip, options.grayscale)
+    bbox = _scan(pix, options.threshold, options)
+    if bbox is None:
+        return None
+    left, top, right, bottom = bbox
+    zoom = options.dpi / 72
+    return fitz.Rect((pix.x + left) / zoom, (pix.y + top) / zoom,
+                     (pix.x + right) / zoom, (pix.y + bottom) / zoom)
+
+
+def _analyze_two_stage(page, options):
+    """先低分辨率整页粗检测，再只对四条边附近的条带按 options.dpi 精细检测
+
+    远小于一个粗检测像素的图形在低分辨率下可能完全不着色：粗检测什么也没找到时
+    退回整页检测；但主体内容以外、边长小于约 1/8 个粗检测像素的孤立小点
+    （默认 18 dpi 时约 0.5 磅的黑点，浅色时更大）可能被忽略，
+    需要与整页检测逐像素一致时应把 coarse_dpi 设为 0。
+    """
+    pix = _render(page, options.coarse_dpi, grayscale=options.grayscale)
+    # 低分辨率下细线和小字会被抗锯齿冲淡，按像素面积比例放宽粗检测阈值，
+    # 宁可多检出，再由精细检测确认
+    scale = (options.coarse_dpi / options.dpi) ** 2
+    bbox = _scan(pix, options.threshold * scale, options)
+    if bbox is None:
+        # 可能只有低分辨率下不着色的小点，整页确认
+        return _analyze_full(page, options)
+    left, top, right, bottom = bbox
+
+    # 粗检测的每个像素对应 cell 磅，内容边界落在边缘像素所覆盖的范围内
+    cell = 72 / options.coarse_dpi
+    band = options.refine_band
+    ax0 = page.rect.x0 + left * cell
+    ay0 = page.rect.y0 + top * cell
+    ax1 = page.rect.x0 + (right + 1) * cell
+    ay1 = page.rect.y0 + (bottom + 1) * cell
+
+    bands = (
+        fitz.Rect(ax0 - band, ay0 - band, ax0 + cell + band, ay1 + band),  # 左
+        fitz.Rect(ax1 - cell - band, ay0 - band, ax1 + band, ay1 + band),  # 右
+        fitz.Rect(ax0 - band, ay0 - band, ax1 + band, ay0 + cell + band),  # 上
+        fitz.Rect(ax0 - band, ay1 - cell - band, ax1 + band, ay1 + band),  # 下
+    )
+    found = []
+    for clip in bands:
+        rect = _analyze_band(page, clip, options)
+        if rect is None:
+            # 粗检测到的只是浅色杂点，条带内没有真正的内容，退回整页检测
+            return _analyze_full(page, options)
+        found.append(rect)
+    left_band, right_band, top_band, bottom_band = found
+    return fitz.Rect(left_band.x0, top_band.y0, right_band.x1, bottom_band.y1)
+
+
+def page_dpi(page_rect, options):
+    """按页面大小、边界精度与像素上限决定本页的 (dpi, coarse_dpi)
+
+    精度为 precision 磅时每个像素不能大于 precision 磅，即 dpi = 72 / precision；
+    整页按 dpi 渲染的像素数不超过 max_megapixels 百万，超过时按面积比例降低分辨率，
+    使 A0 图纸与小幅幻灯片的单页内存和耗时都在可预期的范围内。
+    """
+    dpi = 72 / options.precision if options.precision else options.dpi
+    area = abs(page_rect)
+    if options.max_megapixels and area:
+        dpi = min(dpi, 72 * math.sqrt(options.max_megapixels * 1e6 / area))
+    return dpi, min(options.coarse_dpi, dpi)
+
+
+def thumbnail_ink_bounds(page, options=None):
+    """渲染缩略图，返回 (bounds, "thumbnail")：页面上一定有内容延伸到的范围
+
+    缩略图按粗检测分辨率渲染，每个有墨迹的像素只说明内容与该像素相交。
+    bounds 取最外侧有墨迹像素的内侧边，因此 bounds 以外的某处一定有内容；
+    没有内容时 bounds 为 None。用于廉价地判断页面内容是否超出了给定的裁剪框。
+    """
+    options = options or AnalysisOptions()
+    dpi, coarse_dpi = page_dpi(page.rect, options)
+    thumb_dpi = min(coarse_dpi or THUMBNAIL_DPI, dpi)
+    with stage("thumbnail"):
+        pix = _render(page, thumb_dpi, grayscale=options.grayscale)
+        # 与粗检测相同，按像素面积比例放宽阈值，避免细线与小字被抗锯齿冲淡
+        bbox = _scan(pix, options.threshold * (thumb_dpi / dpi) ** 2, options)
+    if bbox is None:
+        return None, "thumbnail"
+    left, top, right, bottom = bbox
+    cell = 72 / thumb_dpi
+    return fitz.Rect(page.rect.x0 + (left + 1) * cell, page.rect.y0 + (top + 1) * cell,
+                     page.rect.x0 + right * cell, page.rect.y0 + bottom * cell), "thumbnail"
+
+
+def _analyze_raster(page, options):
+    dpi, coarse_dpi = page_dpi(page.rect, options)
+    if (dpi, coarse_dpi) != (options.dpi, options.coarse_dpi):
+        options = replace(options, dpi=dpi, coarse_dpi=coarse_dpi)
+    # 抗噪过滤需要整页的行/列投影，不使用两阶段检测
+    if options.coarse_dpi and options.coarse_dpi < options.dpi and not options.filters_noise:
+        return _analyze_two_stage(page, options)
+    return _analyze_full(page, options)
+
+
+def _is_light(color, threshold):
+    """判断填充颜色是否接近白色（不算作内容）"""
+    if color is None:
+        return True
+    if len(color) == 4:  # CMYK
+        return all(c <= threshold for c in color)
+    return all(c >= 1 - threshold for c in color)
+
+
+def _path_ink_rect(path, threshold):
+    """矢量路径实际着墨的区域：非浅色填充的外框，或非浅色描边外扩半个线宽"""
+    rect = fitz.Rect(path["rect"])
+    ink = fitz.Rect()
+    if not _is_light(path.get("fill"), threshold):
+        ink |= rect
+    if not _is_light(path.get("color"), threshold):
+        half_width = (path.get("width") or 1) / 2
+        ink |= rect + (-half_width, -half_width, half_width, half_width)
+    return ink
+
+
+def _analyze_vector(page, options):
+    """根据页面绘制的文字、路径、图像的外框计算内容区域
+
+    返回 (content_rect, image_ratio)，image_ratio 为图像覆盖页面面积的比例。
+    文字与图像取 get_bboxlog 的外框；路径的外框按描边斜接上限估算，偏大较多，
+    且无法区分白色背景，因此改用 get_drawings 按颜色和线宽计算。
+    这些坐标都是未旋转的页面坐标，最后转换到 page.rect 所在的坐标系。
+    """
+    page_area = abs(page.rect) or 1
+    unrotated = page.rect * page.derotation_matrix
+    content = fitz.Rect()
+    image_area = 0.0
+    has_paths = False
+
+    for kind, bbox in page.get_bboxlog():
+        if kind.startswith("ignore"):
+            continue
+        if kind.endswith("-path"):
+            has_paths = True
+            continue
+        rect = fitz.Rect(bbox) & unrotated
+        if rect.is_empty:
+            continue
+        if kind in ("fill-image", "fill-imgmask"):
+            image_area += abs(rect)
+        content |= rect
+
+    if has_paths:
+        for path in page.get_drawings():
+            rect = _path_ink_rect(path, options.threshold) & unrotated
+            if not rect.is_empty:
+                content |= rect
+
+    image_ratio = min(image_area / page_area, 1.0)
+    if content.is_empty:
+        return None, image_ratio
+    return (content * page.rotation_matrix) & page.rect, image_ratio
+
+
+def detect_page(page, options=None):
+    """检测页面内容区域，返回 (content_rect, detector)
+
+    content_rect 为PDF坐标（未加安全边距），没有内容时为 None；
+    detector 为实际使用的检测方式（raster 或 vector）。
+    """
+    options = options or AnalysisOptions()
+    if options.detector not in DETECTORS:
+        raise ValueError(f"未知的检测方式: {options.detector}")
+
+    if options.detector == DETECTOR_RASTER:
+        return _analyze_raster(page, options), DETECTOR_RASTER
+
+    with stage("vector"):
+        rect, image_ratio = _analyze_vector(page, options)
+    if options.detector == DETECTOR_AUTO and image_ratio >= IMAGE_DOMINANT_RATIO:
+        # 扫描件等以图像为主的页面，几何外框无法反映图像内部的白边
+        return _analyze_raster(page, options), DETECTOR_RASTER
+    return rect, DETECTOR_VECTOR
+
+
+def analyze_page(page, options=None):
+    """检测页面内容区域（PDF坐标，未加安全边距），没有内容时返回 None"""
+    return detect_page(page, options)[0]
+
+
+def plan_crop(page_rect, content_rect, safety_margin=10, axis=AXIS_BOTH):
+    """根据内容区域、安全边距（磅）和裁剪方向计算最终的裁剪框"""
+    if axis not in AXIS_MODES:
+        raise ValueError(f"未知的裁剪方向: {axis}")
+
+    page_rect = fitz.Rect(page_rect)
+    # 如果没有检测到内容，返回原始页面边界
+    if content_rect is None:
+        return page_rect
+
+    x0, y0, x1, y1 = content_rect
+    if axis in (AXIS_BOTH, AXIS_HORIZONTAL):
+        x0 = max(page_rect.x0, x0 - safety_margin)
+        x1 = min(page_rect.x1, x1 + safety_margin)
+    else:
+        x0 = page_rect.x0
+        x1 = page_rect.x1
+
+    if axis in (AXIS_BOTH, AXIS_VERTICAL):
+        y0 = max(page_rect.y0, y0 - safety_margin)
+        y1 = min(page_rect.y1, y1 + safety_margin)
+    else:
+        y0 = page_rect.y0
+        y1 = page_rect.y1
+
+    return fitz.Rect(x0, y0, x1, y1)
+
+
+def detect_content_bbox(page, options=None, safety_margin=10, axis=AXIS_BOTH):
+    """检测页面内容并返回加上安全边距后的裁剪框"""
+    return plan_crop(page.rect, analyze_page(page, options), safety_margin, axis)
+
+
+def uniform_groups(doc, uniform=UNIFORM_DOCUMENT):
+    """按统一裁剪范围把页码划分为若干组，每组使用同一个裁剪框
+
+    chapter 按一级书签的目标页划分，第一章之前的页面（封面、目录等）单独为一组；
+    没有书签时整个文档为一组。
+    """
+    if uniform not in UNIFORM_MODES:
+        raise ValueError(f"未知的统一裁剪范围: {uniform}")
+    total = len(doc)
+    if uniform == UNIFORM_PAGE:
+        return [[page_num] for page_num in range(total)]
+
+    starts = {0}
+    if uniform == UNIFORM_CHAPTER:
+        starts.update(page - 1 for level, title, page, *_ in doc.get_toc()
+                      if level == 1 and 1 <= page <= total)
+    starts = sorted(starts)
+    return [list(range(start, stop)) for start, stop in zip(starts, starts[1:] + [total]) if start < stop]
+
+
+def split_odd_even(groups):
+    """把每组页面再分为奇数页（右页）与偶数页（左页）两组，页码从1开始计"""
+    split = []
+    for group in groups:
+        split.extend(part for part in (group[0::2], group[1::2]) if part)
+    return split
+
+
+def sample_group(pages, count):
+    """从一组页面中均匀抽取 count 页，count 为 0 或不小于页数时返回全部页面"""
+    if not count or count >= len(pages):
+        return list(pages)
+    if count == 1:
+        return [pages[len(pages) // 2]]
+    return sorted({pages[round(i * (len(pages) - 1) / (count - 1))] for i in range(count)})
+
+
+def _percentile(values, q):
+    """线性插值的百分位数，q 取 0~100"""
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    low = math.floor(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+def uniform_rect(content_rects, percentile=100):
+    """合并一组页面的内容区域，没有任何内容时返回 None
+
+    percentile 为 100 时取并集；小于 100 时每条边取百分位数，
+    使约 percentile% 的页面内容落在框内，避免个别超宽的插图或页眉把框撑大。
+    """
+    rects = [fitz.Rect(rect) for rect in content_rects if rect is not None]
+    if not rects:
+        return None
+    return fitz.Rect(_percentile([rect.x0 for rect in rects], 100 - percentile),
+                     _percentile([rect.y0 for rect in rects], 100 - percentile),
+                     _percentile([rect.x1 for rect in rects], percentile),
+                     _percentile([rect.y1 for rect in rects], percentile))
+
+
+def is_outlier(ink_bounds, crop_box):
+    """缩略图显示页面内容超出了裁剪框（见 thumbnail_ink_bounds）"""
+    if ink_bounds is None:
+        return False
+    x0, y0, x1, y1 = ink_bounds
+    return x0 <= crop_box.x0 or y0 <= crop_box.y0 or x1 >= crop_box.x1 or y1 >= crop_box.y1
+
+
+def plan_uniform(doc, input_path, options=None, safety_margin=10, axis=AXIS_BOTH, workers=None,
+                 cache=None, dedup=True, progress_callback=None, report=None,
+                 uniform=UNIFORM_DOCUMENT, sample=0, percentile=100,
+                 odd_even=False, check_outliers=False):
+    """统一裁剪的规划，返回每页的裁剪框列表
+
+    按 uniform_groups 分组（odd_even 为真时每组再分为奇数页与偶数页，
+    适合左右页边距镜像的书籍扫描件），每组分析抽取的 sample 页并合并为一个裁剪框。
+    check_outliers 为真时其余页面只渲染缩略图，内容超出本组裁剪框的页面
+    再单独分析并按自己的内容区域裁剪。
+    """
+    options = options or AnalysisOptions()
+    report = report if report is not None else TrimReport()
+    groups = uniform_groups(doc, uniform)
+    if odd_even:
+        groups = split_odd_even(groups)
+    sampled = [page_num for group in groups for page_num in sample_group(group, sample)]
+    sampled_set = set(sampled)
+    rest = [page_num for page_num in range(len(doc)) if page_num not in sampled_set] if check_outliers else []
+
+    # 三个阶段共用一个进度：抽样分析、缩略图检查、离群页面分析
+    expected = [len(sampled) + len(rest)]
+
+    def phase_progress(offset):
+        def on_progress(done, _):
+            if progress_callback:
+                progress_callback(offset + done, expected[0])
+        return on_progress
+
+    content_rects = {}
+    for page_num, content_rect, detector in analyze_document(
+            doc, input_path, options, workers, cache, dedup, phase_progress(0), report, page_nums=sampled):
+        content_rects[page_num] = content_rect
+        report.sampled_pages.append(page_num)
+        report.detectors.append(detector)
+
+    crop_boxes = [None] * len(doc)
+    for group in groups:
+        group_rect = uniform_rect([content_rects.get(page_num) for page_num in group], percentile)
+        for page_num in group:
+            crop_boxes[page_num] = plan_crop(doc.load_page(page_num).rect, group_rect, safety_margin, axis)
+
+    if rest:
+        outliers = [page_num for page_num, bounds, _ in iter_page_analysis(
+                        input_path, rest, options, workers, progress_callback=phase_progress(len(sampled)),
+                        page_func=thumbnail_ink_bounds)
+                    if is_outlier(bounds, crop_boxes[page_num])]
+        report.outliers = len(outliers)
+        expected[0] += len(outliers)
+        for page_num, content_rect, detector in analyze_document(
+                doc, input_path, options, workers, cache, dedup,
+                phase_progress(len(sampled) + len(rest)), page_nums=outliers):
+            crop_boxes[page_num] = plan_crop(doc.load_page(page_num).rect, content_rect, safety_margin, axis)
+            report.sampled_pages.append(page_num)
+            report.detectors.append(detector)
+    return crop_boxes
+
+
+class _PageSource:
+    """按页读取输入文件，每读取 REOPEN_PAGES 页重新打开一次文档
+
+    MuPDF 在文档关闭前一直保留已解析的对象，长文档逐页处理时内存随页数增长；
+    定期重新打开即可释放已处理页面的对象。load_page 返回的页面在下次调用前使用完毕。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.doc = None
+        self.loaded = 0
+
+    def load_page(self, page_num):
+        if self.doc is None or self.loaded >= REOPEN_PAGES:
+            if self.doc is not None:
+                self.close()
+                fitz.TOOLS.store_shrink(100)
+            self.doc = fitz.open(self.path)
+        self.loaded += 1
+        return self.doc.load_page(page_num)
+
+    def close(self):
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+        self.loaded = 0
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# 工作进程各自持有的输入文档
+_worker_doc = None
+
+
+def _init_worker(input_path):
+    global _worker_doc
+    _worker_doc = _PageSource(input_path)
+
+
+def _analyze_pages(doc, page_nums, options, page_func=None):
+    page_func = page_func or detect_page
+    results = []
+    for page_num in page_nums:
+        with stage("analyze"):
+            rect, detector = page_func(doc.load_page(page_num), options)
+        results.append((tuple(rect) if rect is not None else None, detector))
+    return results
+
+
+def _analyze_chunk(index, page_nums, options, profile_trace=None, page_func=None):
+    """分析一块页面；profile_trace 不为 None 时在本进程内计时，并把计时数据一并返回"""
+    if profile_trace is None:
+        return index, _analyze_pages(_worker_doc, page_nums, options, page_func), None
+    profiler = StageProfiler(trace=profile_trace)
+    with profiler.activate():
+        results = _analyze_pages(_worker_doc, page_nums, options, page_func)
+    return index, results, profiler.export()
+
+
+def default_workers():
+    """默认工作进程数：CPU 核心数"""
+    return os.cpu_count() or 1
+
+
+def iter_page_analysis(input_path, page_nums, options=None, workers=None,
+                       chunk_size=None, progress_callback=None, page_func=None, total=None, source=None):
+    """分块分析指定各页的内容区域，按 page_nums 的顺序逐页产出 (page_num, content_rect, detector)
+
+    workers 个工作进程各自打开输入文件，按 chunk_size 页一块并行分析；
+    每完成一块调用一次 progress_callback(done, total)。
+    page_nums 可以是边产出边计算的迭代器，此时由 total 给出总页数（用于进度与分块大小）；
+    同时提交给工作进程的块数有上限，只在需要时才从 page_nums 中取页码。
+    content_rect 为 (x0, y0, x1, y1) 元组，没有内容时为 None。
+    page_func(page, options) 返回 (content_rect, detector)，默认为 detect_page，
+    需为模块级函数以便传给工作进程。
+    source 为调用方已打开的 _PageSource，只用一个进程分析时用它读取页面，不再另外打开输入文件。
+    """
+    options = options or AnalysisOptions()
+    if total is None:
+        page_nums = list(page_nums)
+        total = len(page_nums)
+    workers = max(1, min(workers or default_workers(), total or 1))
+    if chunk_size is None:
+        # 每个进程约分到 4 块，兼顾负载均衡与进程间通信开销
+        chunk_size = max(1, min(32, math.ceil(total / (workers * 4))))
+
+    chunks = enumerate(_chunked(page_nums, chunk_size))
+    done = 0
+
+    if workers == 1:
+        doc = source or _PageSource(input_path)
+        try:
+            for _, chunk in chunks:
+                results = _analyze_pages(doc, chunk, options, page_func)
+                done += len(results)
+                if progress_callback:
+                    progress_callback(done, total)
+                for page_num, (rect, detector) in zip(chunk, results):
+                    yield page_num, rect, detector
+        finally:
+            if doc is not source:
+                doc.close()
+        return
+
+    # 启用了计时时，工作进程各自计时后把数据传回来合并
+    profiler = current_profiler()
+    profile_trace = profiler.trace if profiler is not None else None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(input_path,)) as executor:
+        pending = set()
+        chunk_pages = {}
+
+        def submit_chunks():
+            # 每个进程最多排队 4 块
+            while len(pending) < workers * 4:
+                item = next(chunks, None)
+                if item is None:
+                    return
+                index, chunk = item
+                chunk_pages[index] = chunk
+                pending.add(executor.submit(_analyze_chunk, index, chunk, options, profile_trace, page_func))
+
+        # 块可能乱序完成，先缓存，再按顺序产出连续的部分
+        finished = {}
+        next_index = 0
+        submit_chunks()
+        while pending:
+            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                pending.discard(future)
+                index, results, profile_data = future.result()
+                if profile_data is not None:
+                    profiler.merge(profile_data)
+                finished[index] = results
+                done += len(results)
+                if progress_callback:
+                    progress_callback(done, total)
+            while next_index in finished:
+                results = finished.pop(next_index)
+                for page_num, (rect, detector) in zip(chunk_pages.pop(next_index), results):
+                    yield page_num, rect, detector
+                next_index += 1
+            submit_chunks()
+
+
+def analyze_document(doc, input_path, options=None, workers=None, cache=None,
+                     dedup=True, progress_callback=None, report=None, page_nums=None):
+    """分析文档各页内容区域，按页码顺序逐页产出 (page_num, content_rect, detector)
+
+    page_nums 为要分析的页码（从0开始），默认为全部页面。
+    提供 cache（pdf_trim_cache.BBoxCache）时先按页面指纹查询缓存，
+    dedup 为真时指纹相同的页面（如相同模板的幻灯片、重复的空白页）只分析一次，
+    其余页面交给工作进程分析，分析结果再写回缓存。
+    指纹按 FINGERPRINT_WINDOW 页一批计算，与页面分析交替进行，第一批页面分析完即开始产出。
+    """
+    options = options or AnalysisOptions()
+    page_nums = range(len(doc)) if page_nums is None else sorted(page_nums)
+    total = len(page_nums)
+    windows = _chunked(page_nums, FINGERPRINT_WINDOW)
+    source = _PageSource(input_path)
+    if report is not None:
+        report.cache_hits = 0
+        report.deduplicated = 0
+
+    # entries 为已计算指纹、等待产出的 (page_num, 缓存结果, 与之相同的前面页码)，
+    # misses 为其中需要分析的页码
+    entries = deque()
+    misses = deque()
+    keys = {}
+    first_page = {}
+    skipped = 0
+    analyzed_count = 0
+
+    def plan_window():
+        """计算下一批页面的指纹并分类，没有剩余页面时返回 False"""
+        nonlocal skipped
+        window = next(windows, None)
+        if window is None:
+            return False
+        fingerprints = {}
+        if cache is not None or dedup:
+            for page_num in window:
+                with stage("fingerprint"):
+                    page = source.load_page(page_num)
+                    fingerprints[page_num] = page_fingerprint(source.doc, page)
+
+        cached = {}
+        if cache is not None:
+            window_keys = {page_num: cache.make_key(fp, options) for page_num, fp in fingerprints.items()}
+            with stage("cache"):
+                found = cache.get_many(set(window_keys.values()))
+            cached = {page_num: found[key] for page_num, key in window_keys.items() if key in found}
+            keys.update((page_num, key) for page_num, key in window_keys.items() if page_num not in cached)
+
+        duplicates = 0
+        for page_num in window:
+            duplicate = None
+            # 与前面某页内容完全相同的页面直接复用那一页的结果
+            if page_num not in cached and dedup:
+                duplicate = first_page.setdefault(fingerprints[page_num], page_num)
+                if duplicate == page_num:
+                    duplicate = None
+                else:
+                    duplicates += 1
+            entries.append((page_num, cached.get(page_num), duplicate))
+            if page_num not in cached and duplicate is None:
+                misses.append(page_num)
+
+        if report is not None:
+            report.cache_hits += len(cached)
+            report.deduplicated += duplicates
+        if cached or duplicates:
+            skipped += len(cached) + duplicates
+            if progress_callback:
+                progress_callback(skipped + analyzed_count, total)
+        return True
+
+    def next_misses():
+        while True:
+            while misses:
+                yield misses.popleft()
+            if not plan_window():
+                return
+
+    def on_progress(done, _):
+        nonlocal analyzed_count
+        analyzed_count = done
+        if progress_callback:
+            progress_callback(skipped + done, total)
+
+    analyzed = iter_page_analysis(input_path, next_misses(), options, workers,
+                                  progress_callback=on_progress, total=total, source=source)
+    results = {}
+    new_entries = []
+    try:
+        while entries or plan_window():
+            page_num, cached_result, duplicate = entries.popleft()
+            if cached_result is not None:
+                rect, detector = cached_result
+            elif duplicate is not None:
+                rect, detector = results[duplicate]
+            else:
+                _, rect, detector = next(analyzed)
+                if cache is not None:
+                    new_entries.append((keys.pop(page_num), rect, detector))
+            if dedup and cached_result is None and duplicate is None:
+                results[page_num] = (rect, detector)
+            yield page_num, rect, detector
+    finally:
+        analyzed.close()
+        source.close()
+        if new_entries:
+            with stage("cache"):
+                cache.put_many(new_entries)
+
+
+def remap_toc(toc, page_mapping):
+    """按页面映射（原页面索引 -> 新页面索引，均从0开始）调整书签目标页"""
+    new_toc = []
+    for bm in toc:
+        level, title, page_num = bm[:3]
+        if page_num - 1 in page_mapping:
+            new_bookmark = [level, title, page_mapping[page_num - 1] + 1]
+            # 保留可选的跳转坐标信息
+            if len(bm) > 3:
+                new_bookmark.extend(bm[3:])
+            new_toc.append(new_bookmark)
+    return new_toc
+
+
+_REF_PATTERN = re.compile(r"\b(\d+) 0 R\b")
+
+# 页面树对象各自不同且互相引用，不参与合并
+_PAGE_TREE_TYPES = ("/Page", "/Pages")
+
+
+def join_parts(part_paths, output_path):
+    """把各分块文件按顺序合并为一个PDF
+
+    逐个打开分块，从页面树出发读取用到的对象，重新编号后直接写入 output_path，
+    每个分块的页面树作为新页面树的一个子节点，内存中只有一个分块的对象。
+    各分块各自复制过一份共享的字体与图像，内容相同的对象只写一次：
+    按引用关系后序处理，被引用的对象先确定编号，引用它的对象再按替换编号后的内容比较，
+    这样字体及其字体描述、字形文件等整组依赖对象都能合并。
+    与 save(garbage=4) 两两比较所有对象不同，耗时与对象数成正比。
+    """
+    offsets = [0, 0, 0]  # 对象编号 1、2 留给 Catalog 与根 Pages
+    known = {}  # 内容摘要 -> 已写出的对象编号
+    kids = []
+    page_count = 0
+
+    with open(output_path, "wb") as out:
+        out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+        def write_object(num, text, raw):
+            offsets[num] = out.tell()
+            out.write(f"{num} 0 obj\n{text}\n".encode("ascii"))
+            if raw is not None:
+                out.write(b"stream\n" + raw + b"\nendstream\n")
+            out.write(b"endobj\n")
+
+        for path in part_paths:
+            with fitz.open(path) as part:
+                pages_xref = int(part.xref_get_key(part.pdf_catalog(), "Pages")[1].split()[0])
+                texts = {}
+                stack = [pages_xref]
+                while stack:
+                    xref = stack.pop()
+                    if xref not in texts:
+                        texts[xref] = part.xref_object(xref, compressed=True, ascii=True)
+                        stack.extend(int(ref) for ref in _REF_PATTERN.findall(texts[xref]))
+
+                numbers = {}
+
+                def number(xref):
+                    if xref not in numbers:
+                        numbers[xref] = len(offsets)
+                        offsets.append(0)
+                    return numbers[xref]
+
+                def emit(xref):
+                    text = _REF_PATTERN.sub(lambda m: f"{number(int(m.group(1)))} 0 R", texts.pop(xref))
+                    raw = part.xref_stream_raw(xref) if part.xref_is_stream(xref) else None
+                    if raw is not None:
+                        text = re.sub(r"/Length \d+(?: 0 R)?(?![\d.])", f"/Length {len(raw)}", text, count=1)
+                    if xref == pages_xref:
+                        text = text[:-2] + "/Parent 2 0 R>>"
+                    elif part.xref_get_key(xref, "Type")[1] not in _PAGE_TREE_TYPES:
+                        digest = hashlib.sha1(text.encode())
+                        if raw is not None:
+                            digest.update(raw)
+                        digest = digest.digest()
+                        # 已因环形引用提前分配了编号的对象仍须写出
+                        if digest in known and xref not in numbers:
+                            numbers[xref] = known[digest]
+                            return
+                        known.setdefault(digest, number(xref))
+                    write_object(number(xref), text, raw)
+
+                # 以栈代替递归按引用关系后序处理；环上的引用提前分配编号
+                done = set()
+                visiting = {pages_xref}
+                stack = [(pages_xref, iter(_REF_PATTERN.findall(texts[pages_xref])))]
+                while stack:
+                    xref, refs = stack[-1]
+                    for ref in map(int, refs):
+                        if ref not in done and ref not in visiting:
+                            visiting.add(ref)
+                            stack.append((ref, iter(_REF_PATTERN.findall(texts[ref]))))
+                            break
+                    else:
+                        stack.pop()
+                        visiting.discard(xref)
+                        done.add(xref)
+                        emit(xref)
+
+                kids.append(numbers[pages_xref])
+                page_count += len(part)
+
+        kids_text = "".join(f"{num} 0 R " for num in kids)
+        write_object(1, "<</Type/Catalog/Pages 2 0 R>>", None)
+        write_object(2, f"<</Type/Pages/Count {page_count}/Kids[{kids_text.strip()}]>>", None)
+        xref_offset = out.tell()
+        out.write(f"xref\n0 {len(offsets)}\n0000000000 65535 f \n".encode("ascii"))
+        out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets[1:]).encode("ascii"))
+        out.write(f"trailer\n<</Size {len(offsets)}/Root 1 0 R>>\n"
+                  f"startxref\n{xref_offset}\n%%EOF\n".encode("ascii"))
+
+
+class DocumentEmitter:
+    """按页码顺序输出裁剪后的页面，最后复制书签与元数据
+
+    flush_every 为正整数时启用流式输出：每追加 flush_every 页就把这些页面保存为
+    output_path + ".parts" 目录中的一个分块文件并关闭，同时重新打开输入文件，
+    释放复制页面时读入与复制的对象，使内存占用不随页数增长；
+    中途出错时已写出的页面仍保留在分块文件中。全部完成后由 join_parts
+    逐个读取分块合并为 output_path，再增量写入书签与元数据，并删除分块目录。
+    """
+
+    def __init__(self, doc, output_path, flush_every=None):
+        self.doc = doc
+        self.source = doc  # 复制页面内容的来源，流式输出时定期重新打开
+        self.output_path = output_path
+        self.flush_every = flush_every
+        self.parts_dir = output_path + ".parts" if flush_every else None
+        self.part_paths = []
+        self.output_doc = fitz.open()
+        self.page_mapping = {}
+        self.pending = 0
+        self.written = 0  # 已保存到分块文件的页数
+
+    def add(self, page_num, crop_box):
+        new_page = self.output_doc.new_page(width=crop_box.width, height=crop_box.height)
+        # 将原页面内容映射到新页面
+        with stage("show_pdf_page"):
+            new_page.show_pdf_page(new_page.rect, self.source, page_num, clip=crop_box)
+        self.page_mapping[page_num] = self.written + new_page.number
+        self.pending += 1
+        if self.flush_every and self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """把已追加的页面保存为一个分块文件"""
+        if not self.parts_dir or not self.pending:
+            return
+        with stage("flush"):
+            os.makedirs(self.parts_dir, exist_ok=True)
+            path = os.path.join(self.parts_dir, f"part_{len(self.part_paths) + 1:05d}.pdf")
+            self.output_doc.save(path)
+            self.output_doc.close()
+            self.output_doc = fitz.open()
+            self.part_paths.append(path)
+            if self.doc.name and os.path.isfile(self.doc.name):
+                if self.source is not self.doc:
+                    self.source.close()
+                self.source = fitz.open(self.doc.name)
+        self.written += self.pending
+        self.pending = 0
+
+    def finish(self):
+        """写入书签与元数据并保存输出文件"""
+        self.flush()
+        if self.part_paths:
+            with stage("join"):
+                self.output_doc.close()
+                join_parts(self.part_paths, self.output_path)
+                self.output_doc = fitz.open(self.output_path)
+
+        with stage("set_toc"):
+            toc = self.doc.get_toc()
+            if toc:
+                self.output_doc.set_toc(remap_toc(toc, self.page_mapping))
+            self.output_doc.set_metadata(self.doc.metadata)
+
+        with stage("save"):
+            if self.part_paths:
+                self.output_doc.save(self.output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            else:
+                self.output_doc.save(self.output_path)
+        self.close()
+        if self.parts_dir and os.path.isdir(self.parts_dir):
+            shutil.rmtree(self.parts_dir)
+
+    def close(self):
+        if self.output_doc is not None:
+            self.output_doc.close()
+            self.output_doc = None
+        if self.source is not self.doc:
+            self.source.close()
+            self.source = self.doc
+
+
+class CropBoxEmitter:
+    """在原文档的副本上直接修改每页的 CropBox 完成裁剪
+
+    页面内容不重新嵌入，链接、注释与书签都原样保留，输出更小、保存更快。
+    接口与 DocumentEmitter 相同。
+    """
+
+    def __init__(self, input_path, output_path):
+        self.output_path = output_path
+        self.output_doc = fitz.open(input_path)
+
+    def add(self, page_num, crop_box):
+        page = self.output_doc.load_page(page_num)
+        # crop_box 位于 page.rect 坐标系（已旋转、以当前 CropBox 左上角为原点），
+        # set_cropbox 需要未旋转、以 MediaBox 左上角为原点的坐标
+        rect = fitz.Rect(crop_box) * page.derotation_matrix
+        origin = page.cropbox.tl
+        with stage("set_cropbox"):
+            page.set_cropbox(rect + (origin.x, origin.y, origin.x, origin.y))
+
+    def finish(self):
+        with stage("save"):
+            self.output_doc.save(self.output_path, garbage=1)
+        self.close()
+
+    def close(self):
+        if self.output_doc is not None:
+            self.output_doc.close()
+            self.output_doc = None
+
+
+def make_emitter(doc, input_path, output_path, emit_mode=EMIT_EMBED, flush_every=None):
+    """按输出方式创建输出器"""
+    if emit_mode == EMIT_EMBED:
+        return DocumentEmitter(doc, output_path, flush_every)
+    if emit_mode == EMIT_CROPBOX:
+        return CropBoxEmitter(input_path, output_path)
+    raise ValueError(f"未知的输出方式: {emit_mode}")
+
+
+def emit_document(doc, crop_boxes, output_path, flush_every=None):
+    """按裁剪框输出新文档，并复制书签与元数据"""
+    emitter = DocumentEmitter(doc, output_path, flush_every)
+    try:
+        for page_num, crop_box in enumerate(crop_boxes):
+            emitter.add(page_num, crop_box)
+        emitter.finish()
+    finally:
+        emitter.close()
+
+
+@dataclass
+class TrimReport:
+    """一次裁剪的统计信息"""
+    total_pages: int = 0
+    detectors: list = field(default_factory=list)  # 每页实际使用的检测方式
+    cache_hits: int = 0  # 从缓存取得内容区域的页数
+    deduplicated: int = 0  # 与前面某页内容相同、直接复用结果的页数
+    sampled_pages: list = field(default_factory=list)  # 统一裁剪时实际分析的页码，与 detectors 一一对应
+    outliers: int = 0  # 统一裁剪时内容超出本组裁剪框、改为单独裁剪的页数
+
+    def detector_counts(self):
+        return Counter(self.detectors)
+
+
+def trim_pdf(input_path, output_path, options=None, safety_margin=10,
+             axis=AXIS_BOTH, workers=None, cache=None, dedup=True, flush_every=None,
+             emit_mode=EMIT_EMBED, progress_callback=None, profiler=None,
+             uniform=UNIFORM_PAGE, sample=0, percentile=100, odd_even=False, check_outliers=False):
+    """裁剪PDF文件的每一页，返回 TrimReport
+
+    页面分析由 workers 个进程并行完成（默认 CPU 核心数），
+    提供 cache 时复用以前的分析结果，dedup 为真时内容相同的页面只分析一次。
+    每页分析完成后立即按顺序输出，emit_mode 见 EMIT_MODES，flush_every 见 DocumentEmitter。
+    progress_callback(done, total) 在每块页面分析完成后调用。
+    提供 profiler（pdf_trim_profile.StageProfiler）时统计各阶段耗时，包括工作进程中的耗时。
+
+    uniform 不为 page 时按 uniform_groups 把页面分组，每组只分析均匀抽取的 sample 页
+    （0 表示全部页面），按 percentile 合并为一个裁剪框后用于组内所有页面，
+    页面尺寸一致，长文档的分析量也大幅减少。odd_even 与 check_outliers 见 plan_uniform，
+    uniform 为 page 时指定 odd_even 按 document 分组。
+    """
+    if profiler is not None:
+        with profiler.activate():
+            return trim_pdf(input_path, output_path, options, safety_margin, axis, workers, cache,
+                            dedup, flush_every, emit_mode, progress_callback,
+                            uniform=uniform, sample=sample, percentile=percentile,
+                            odd_even=odd_even, check_outliers=check_outliers)
+    if odd_even and uniform == UNIFORM_PAGE:
+        uniform = UNIFORM_DOCUMENT
+
+    report = TrimReport()
+    with stage("trim_pdf"):
+        doc = fitz.open(input_path)
+        emitter = make_emitter(doc, input_path, output_path, emit_mode, flush_every)
+        try:
+            report.total_pages = len(doc)
+            if uniform == UNIFORM_PAGE:
+                for page_num, content_rect, detector in analyze_document(
+                        doc, input_path, options, workers, cache, dedup, progress_callback, report):
+                    page_rect = doc.load_page(page_num).rect
+                    emitter.add(page_num, plan_crop(page_rect, content_rect, safety_margin, axis))
+                    report.detectors.append(detector)
+            else:
+                crop_boxes = plan_uniform(doc, input_path, options, safety_margin, axis, workers, cache,
+                                          dedup, progress_callback, report, uniform, sample, percentile,
+                                          odd_even, check_outliers)
+                for page_num, crop_box in enumerate(crop_boxes):
+                    emitter.add(page_num, crop_box)
+
+            emitter.finish()
+        finally:
+            emitter.close()
+            doc.close()
+    return report
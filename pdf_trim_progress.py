@@ -0,0 +1,120 @@
+"""PDF白边裁剪的进度统计
+
+裁剪线程通过 ProgressCounter.update（可直接作为 trim_pdf 的 progress_callback）
+只写入两个整数，不加锁也不发送信号；界面或命令行按固定间隔（如每秒 10 次）
+调用 snapshot() 读取进度，并据最近几秒的进度计算每秒页数与剩余时间。
+"""
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# 计算速度时使用的时间窗口(秒)
+RATE_WINDOW = 5.0
+
+
+@dataclass(frozen=True)
+class ProgressSnapshot:
+    done: int
+    total: int
+    elapsed: float  # 已用时间(秒)
+    rate: float  # 每秒页数，尚无法计算时为 0
+    eta: float  # 预计剩余时间(秒)，无法估计时为 None
+
+    @property
+    def percent(self):
+        return int(self.done * 100 / self.total) if self.total else 0
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def format_progress(snapshot):
+    """把进度格式化为一行文字"""
+    return (f"{snapshot.done}/{snapshot.total} 页 ({snapshot.percent}%) | "
+            f"{snapshot.rate:.1f} 页/秒 | 已用 {format_duration(snapshot.elapsed)} | "
+            f"剩余 {format_duration(snapshot.eta)}")
+
+
+class ProgressCounter:
+    """由一个线程写入、另一个线程轮询的进度计数器
+
+    写入方只做整数赋值（在 CPython 中是原子的），读取方自行保存历史样本计算速度，
+    因此两边都不需要锁。
+    """
+
+    def __init__(self):
+        self.done = 0
+        self.total = 0
+        self.start = time.perf_counter()
+        self._samples = deque()
+
+    def update(self, done, total):
+        self.total = total
+        self.done = done
+
+    def snapshot(self):
+        """读取当前进度，只应由一个轮询线程调用"""
+        now = time.perf_counter()
+        done, total = self.done, self.total
+
+        samples = self._samples
+        samples.append((now, done))
+        while len(samples) > 2 and now - samples[1][0] >= RATE_WINDOW:
+            samples.popleft()
+        first_time, first_done = samples[0]
+        rate = (done - first_done) / (now - first_time) if now > first_time else 0.0
+
+        eta = (total - done) / rate if rate > 0 else None
+        if total and done >= total:
+            eta = 0.0
+        return ProgressSnapshot(done, total, now - self.start, rate, eta)
+
+
+class ConsoleProgress:
+    """在命令行中按 interval 秒的间隔刷新一行进度，用法：
+
+        with ConsoleProgress("裁剪页面") as progress:
+            trim_pdf(..., progress_callback=progress.update)
+    """
+
+    def __init__(self, desc="", interval=0.1, stream=None):
+        self.desc = desc
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.counter = ProgressCounter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._last_line = ""
+
+    def update(self, done, total):
+        self.counter.update(done, total)
+
+    def _render(self):
+        line = f"{self.desc}: {format_progress(self.counter.snapshot())}"
+        # 新行比旧行短时用空格覆盖残留字符
+        self.stream.write("\r" + line.ljust(len(self._last_line)))
+        self.stream.flush()
+        self._last_line = line
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._render()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._render()
+        self.stream.write("\n")
+        self.stream.flush()
+        return False
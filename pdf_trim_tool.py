@@ -1,84 +1,55 @@
-import fitz
 import os
 import argparse
-from tqdm import tqdm
+import multiprocessing
+from pdf_bbox import SCAN_MODES, SCAN_EDGES
+from pdf_trim_batch import (collect_inputs, is_glob, plan_batch, run_batch, format_summary,
+                            write_report, STATUS_FAILED)
+from pdf_trim_cache import BBoxCache
+from pdf_trim_profile import StageProfiler
+from pdf_trim_progress import ConsoleProgress
+from pdf_trim_core import (trim_pdf, AnalysisOptions, AXIS_BOTH, DETECTORS, DETECTOR_RASTER,
+                           EMIT_MODES, EMIT_EMBED, UNIFORM_MODES, UNIFORM_PAGE)
 
-def detect_content_bbox(page, threshold=0.1):
-    """检测页面内容的边界框"""
-    # 获取页面尺寸
-    mediabox = page.rect
-    pix = page.get_pixmap()
-    
-    width = pix.width
-    height = pix.height
-    
-    # 初始化边界
-    left = width
-    right = 0
-    top = height
-    bottom = 0
-    
-    # 转换为灰度图像进行检测
-    for y in range(height):
-        for x in range(width):
-            r, g, b = pix.pixel(x, y)
-            # 计算灰度值
-            gray = (r + g + b) // 3
-            # 如果不是白色(接近255)，则认为是内容
-            if gray < 255 * (1 - threshold):
-                left = min(left, x)
-                right = max(right, x)
-                top = min(top, y)
-                bottom = max(bottom, y)
-    
-    # 如果没有检测到内容，返回原始页面边界
-    if left > right or top > bottom:
-        return mediabox
-    
-    # 将像素坐标转换为PDF坐标
-    x0 = mediabox.x0 + left * (mediabox.x1 - mediabox.x0) / width
-    y0 = mediabox.y0 + top * (mediabox.y1 - mediabox.y0) / height
-    x1 = mediabox.x0 + right * (mediabox.x1 - mediabox.x0) / width
-    y1 = mediabox.y0 + bottom * (mediabox.y1 - mediabox.y0) / height
-    
-    # 添加安全边距
-    safety_margin = 10  # 磅
-    x0 = max(mediabox.x0, x0 - safety_margin)
-    y0 = max(mediabox.y0, y0 - safety_margin)
-    x1 = min(mediabox.x1, x1 + safety_margin)
-    y1 = min(mediabox.y1, y1 + safety_margin)
-    
-    return fitz.Rect(x0, y0, x1, y1)
+def print_detector_report(report, verbose=False):
+    """输出每页使用的检测方式"""
+    if verbose:
+        page_nums = report.sampled_pages or range(len(report.detectors))
+        for page_num, detector in zip(page_nums, report.detectors):
+            print(f"第 {page_num + 1} 页: {detector}")
+    counts = report.detector_counts()
+    summary = ", ".join(f"{name} {counts[name]} 页" for name in sorted(counts))
+    print(f"检测方式统计: {summary}")
+
+def crop_pdf(input_path, output_path, threshold=0.1, margin=10, workers=None, verbose=False,
+             cache=None, dedup=True, flush_every=None, emit_mode=EMIT_EMBED, profiler=None,
+             uniform=UNIFORM_PAGE, sample=0, percentile=100, odd_even=False, check_outliers=False,
+             options=None):
+    """裁剪PDF文件的每一页，提供 profiler 时在结束后输出各阶段耗时
 
-def crop_pdf(input_path, output_path, threshold=0.1, margin=0):
-    """裁剪PDF文件的每一页"""
+    options 为 AnalysisOptions，给出时代替 threshold。
+    """
+    if options is None:
+        options = AnalysisOptions(threshold)
     try:
-        # 打开输入PDF
-        doc = fitz.open(input_path)
-        
-        # 创建输出PDF
-        output_doc = fitz.open()
-        
-        # 处理每一页
-        for page_num in tqdm(range(len(doc)), desc="裁剪页面"):
-            page = doc.load_page(page_num)
-            
-            # 检测内容边界
-            content_bbox = detect_content_bbox(page, threshold)
-            
-            # 创建新页面并复制内容
-            new_page = output_doc.new_page(width=content_bbox.width, 
-                                         height=content_bbox.height)
-            
-            # 将原页面内容映射到新页面
-            new_page.show_pdf_page(new_page.rect, doc, page_num, 
-                                  clip=content_bbox)
-        
-        # 保存输出PDF
-        output_doc.save(output_path)
-        output_doc.close()
-        doc.close()
+        with ConsoleProgress("裁剪页面") as progress:
+            report = trim_pdf(input_path, output_path, options, margin, AXIS_BOTH,
+                              workers=workers, cache=cache, dedup=dedup,
+                              flush_every=flush_every, emit_mode=emit_mode,
+                              progress_callback=progress.update, profiler=profiler,
+                              uniform=uniform, sample=sample, percentile=percentile,
+                              odd_even=odd_even, check_outliers=check_outliers)
         
+        print_detector_report(report, verbose)
+        if cache is not None:
+            print(f"缓存命中: {report.cache_hits}/{report.total_pages} 页")
+        if dedup:
+            print(f"重复页面复用: {report.deduplicated} 页")
+        if uniform != UNIFORM_PAGE or odd_even:
+            print(f"统一裁剪: 分析了 {len(report.sampled_pages)}/{report.total_pages} 页")
+        if check_outliers:
+            print(f"内容超出统一裁剪框而单独裁剪: {report.outliers} 页")
+        if profiler is not None:
+            print(profiler.format_summary())
         print(f"PDF裁剪完成，已保存至: {output_path}")
         return True
     
@@ -86,24 +57,154 @@ def crop_pdf(input_path, output_path, threshold=0.1, margin=0):
         print(f"处理PDF时出错: {e}")
         return False
 
+def batch_main(args, options):
+    """批量裁剪多个文件，最后输出每个文件的汇总"""
+    input_paths = collect_inputs(args.input, args.recursive)
+    if not input_paths:
+        print("没有找到PDF文件")
+        return
+    jobs, results = plan_batch(input_paths, args.output, args.force)
+    print(f"共 {len(jobs) + len(results)} 个文件，待处理 {len(jobs)} 个，输出已是最新而跳过 {len(results)} 个")
+    
+    batch = run_batch(jobs, args.jobs, None if args.no_cache else (args.cache_dir or ""),
+                      options=options, safety_margin=args.margin, axis=AXIS_BOTH,
+                      workers=args.workers, dedup=not args.no_dedup,
+                      flush_every=args.flush_every or None, emit_mode=args.emit,
+                      uniform=args.uniform, sample=args.sample, percentile=args.percentile,
+                      odd_even=args.odd_even, check_outliers=args.check_outliers)
+    for done, result in enumerate(batch, 1):
+        results.append(result)
+        if result.status == STATUS_FAILED:
+            print(f"[{done}/{len(jobs)}] 处理失败: {result.input_path}: {result.error}")
+        else:
+            print(f"[{done}/{len(jobs)}] {result.input_path}: {result.pages} 页，"
+                  f"{result.seconds:.2f} 秒，大小减少 {result.reduction:.2f}%")
+    
+    print(format_summary(results))
+    if args.report:
+        write_report(results, args.report)
+        print(f"汇总已保存至: {args.report}")
+
 def main():
     parser = argparse.ArgumentParser(description='PDF自动裁剪工具 - 移除页面白边')
-    parser.add_argument('-i', '--input', required=True, help='输入PDF文件路径')
-    parser.add_argument('-o', '--output', help='输出PDF文件路径，默认为input_cropped.pdf')
+    parser.add_argument('-i', '--input', required=True, nargs='+',
+                        help='输入PDF文件路径；给出多个路径、目录或通配符（如 "docs/*.pdf"）时批量处理')
+    parser.add_argument('-o', '--output', help='输出PDF文件路径，默认为input_cropped.pdf；'
+                                               '批量处理时为输出目录，默认输出到各输入文件旁')
     parser.add_argument('-t', '--threshold', type=float, default=0.1, 
                         help='内容检测阈值(0-1)，值越小越严格，默认为0.1')
     parser.add_argument('-m', '--margin', type=int, default=10, 
                         help='保留的边距(磅)，默认为10')
+    parser.add_argument('--dpi', type=float, default=72,
+                        help='内容边界的检测分辨率(dpi)，默认为72')
+    parser.add_argument('--precision', type=float, default=0,
+                        help='内容边界的精度(磅)，按它为每页决定检测分辨率(72/精度)，代替--dpi；0表示使用--dpi，默认为0')
+    parser.add_argument('--max-megapixels', type=float, default=16,
+                        help='每次渲染的像素上限(百万)，大幅面页面自动降低分辨率以限制内存，0表示不限制，默认为16')
+    parser.add_argument('--band-megapixels', type=float, default=1,
+                        help='整页检测时每条横向条带的像素上限(百万)，超过时分条渲染以限制内存，0表示整页一次渲染，默认为1')
+    parser.add_argument('--coarse-dpi', type=float, default=18,
+                        help='粗检测分辨率(dpi)，先低分辨率定位内容再精细检测四条边，0表示整页按--dpi检测，默认为18。'
+                             '主体内容以外小于约1/8个粗检测像素的孤立小点（默认约0.5磅）可能被忽略')
+    parser.add_argument('--refine-band', type=float, default=12.0,
+                        help='精细检测时在粗略边界两侧额外渲染的宽度(磅)，默认为12')
+    parser.add_argument('--detector', choices=DETECTORS, default=DETECTOR_RASTER,
+                        help='内容检测方式：raster 渲染后按像素检测；vector 按文字/路径/图像的几何信息计算，'
+                             '不渲染；auto 优先按几何信息，以图像为主的页面改用像素检测。默认为raster')
+    parser.add_argument('--min-density', type=float, default=0,
+                        help='抗噪：一行（列）中内容像素所占比例不低于该值(0-1)才算作内容，'
+                             '可忽略扫描件上零星的灰尘污点，如0.005；0表示不过滤，默认为0')
+    parser.add_argument('--min-run', type=float, default=0,
+                        help='抗噪：内容至少连续该宽度(磅)才算作边界，如1.5；0表示不过滤，默认为0。'
+                             '启用抗噪参数时整页按--dpi检测，不使用粗检测')
+    parser.add_argument('--gray', action='store_true',
+                        help='直接渲染为灰度图检测内容，位图内存为RGB的三分之一、耗时更少；但按亮度判断，'
+                             '浅色或彩色细线的边界可能与RGB三通道平均值不同，因此默认不启用')
+    parser.add_argument('--scan', choices=SCAN_MODES, default=SCAN_EDGES,
+                        help='像素扫描方式：full 扫描整幅图像；edges 从四边向内扫描，遇到内容即停止。'
+                             '两者结果相同，默认为edges')
+    parser.add_argument('--uniform', choices=UNIFORM_MODES, default=UNIFORM_PAGE,
+                        help='裁剪框的统一范围：page 每页单独裁剪；document 全文使用同一个裁剪框；'
+                             'chapter 按一级书签分章，每章使用同一个裁剪框。默认为page')
+    parser.add_argument('--sample', type=int, default=0,
+                        help='统一裁剪时每个文档或章节只均匀抽取N页分析，0表示分析全部页面，默认为0')
+    parser.add_argument('--percentile', type=float, default=100,
+                        help='统一裁剪时合并各页内容区域的百分位数，100为并集；'
+                             '如95表示约95%%的页面内容落在框内，忽略个别超宽的页面。默认为100')
+    parser.add_argument('--odd-even', action='store_true',
+                        help='统一裁剪时奇数页与偶数页分别计算裁剪框，适合左右页边距镜像的书籍扫描件；'
+                             '未指定--uniform时按document处理')
+    parser.add_argument('--check-outliers', action='store_true',
+                        help='统一裁剪时用缩略图检查未抽样的页面，内容超出裁剪框的页面单独分析裁剪')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='页面分析的工作进程数，默认为CPU核心数')
+    parser.add_argument('--cache-dir', help='内容区域缓存目录，默认为用户缓存目录下的 office2pdf/trim_cache')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='不使用内容区域缓存（默认会缓存检测结果，重复裁剪时只改边距无需重新渲染）')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='不识别内容相同的页面（默认内容相同的页面只分析一次）')
+    parser.add_argument('--emit', choices=EMIT_MODES, default=EMIT_EMBED,
+                        help='输出方式：embed 新建页面并嵌入原页面内容；cropbox 直接修改原文档每页的CropBox，'
+                             '保留链接与注释，输出更小更快。默认为embed')
+    parser.add_argument('--flush-every', type=int, default=0,
+                        help='流式输出：每输出N页保存为一个分块文件并释放内存，峰值内存不随页数增长，'
+                             '中途出错时已输出的页面仍保留在分块文件中；0表示处理完成后一次性保存，默认为0')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='输出每页使用的检测方式')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='批量处理时包含子目录中的文件，通配符中的 ** 匹配多级目录')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='批量处理时同时处理的文件数，默认为CPU核心数；'
+                             '多个文件并行时每个文件默认只用一个进程分析页面')
+    parser.add_argument('--force', action='store_true',
+                        help='批量处理时也处理输出文件比输入文件新的文件（默认跳过）')
+    parser.add_argument('--report', metavar='FILE',
+                        help='批量处理时把每个文件的页数、耗时与大小保存到 FILE（.csv 或 .json）')
+    parser.add_argument('--profile', action='store_true',
+                        help='统计并输出渲染、像素扫描、页面输出、书签、保存等各阶段的耗时')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='把各阶段的每次调用保存为 Chrome trace 格式的 JSON 文件'
+                             '（可在 chrome://tracing 中查看），隐含 --profile')
     
     args = parser.parse_args()
     
+    options = AnalysisOptions(threshold=args.threshold, dpi=args.dpi,
+                              coarse_dpi=args.coarse_dpi, refine_band=args.refine_band,
+                              detector=args.detector, scan=args.scan, precision=args.precision,
+                              max_megapixels=args.max_megapixels, band_megapixels=args.band_megapixels,
+                              grayscale=args.gray, min_density=args.min_density, min_run=args.min_run)
+    
+    # 已存在的文件名即使含有 [ ] 等字符也按单个文件处理
+    first = args.input[0]
+    if len(args.input) > 1 or os.path.isdir(first) or (is_glob(first) and not os.path.isfile(first)):
+        unsupported = [flag for flag, value in (("--profile", args.profile), ("--trace", args.trace),
+                                                ("--verbose", args.verbose)) if value]
+        if unsupported:
+            parser.error(f"批量处理时不支持 {'、'.join(unsupported)}，请对单个文件使用")
+        return batch_main(args, options)
+    args.input = args.input[0]
+    
     # 确定输出路径
     if not args.output:
         base_name, ext = os.path.splitext(args.input)
         args.output = f"{base_name}_cropped{ext}"
     
+    cache = None if args.no_cache else BBoxCache(args.cache_dir)
+    profiler = StageProfiler(trace=bool(args.trace)) if args.profile or args.trace else None
+    
     # 裁剪PDF
-    success = crop_pdf(args.input, args.output, args.threshold, args.margin)
+    try:
+        success = crop_pdf(args.input, args.output, args.threshold, args.margin, args.workers,
+                           args.verbose, cache, not args.no_dedup, args.flush_every or None,
+                           args.emit, profiler, args.uniform, args.sample, args.percentile,
+                           args.odd_even, args.check_outliers, options=options)
+    finally:
+        if cache is not None:
+            cache.close()
+    
+    if success and args.trace:
+        profiler.write_chrome_trace(args.trace)
+        print(f"跟踪文件已保存至: {args.trace}")
     
     if success:
         # 计算压缩率
@@ -113,4 +214,5 @@ def main():
         print(f"文件大小减少: {reduction:.2f}%")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()    
\ No newline at end of file
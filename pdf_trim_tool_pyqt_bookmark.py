@@ -1,117 +1,46 @@
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, 
                             QHBoxLayout, QFileDialog, QWidget, QCheckBox, QLabel, 
-                            QProgressBar, QMessageBox, QGroupBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                            QProgressBar, QMessageBox, QGroupBox, QDoubleSpinBox)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon
-import fitz
-from tqdm import tqdm
+from pdf_trim_core import trim_pdf, AnalysisOptions, AXIS_BOTH, AXIS_HORIZONTAL
+from pdf_trim_profile import StageProfiler
+from pdf_trim_progress import ProgressCounter, format_progress
 
 class CropThread(QThread):
-    progress_updated = pyqtSignal(int)
     task_completed = pyqtSignal(bool, str)
     
-    def __init__(self, input_path, output_path, trim_vertical):
+    def __init__(self, input_path, output_path, trim_vertical, profile=False, options=None):
         super().__init__()
         self.input_path = input_path
         self.output_path = output_path
         self.trim_vertical = trim_vertical
+        self.profile = profile
+        self.options = options
+        # 工作线程只写入计数器，界面定时读取，不为每块页面发送信号
+        self.progress = ProgressCounter()
         
-    def detect_content_bbox(self, page, threshold=0.1, trim_vertical=True):
-        """检测页面内容的边界框"""
-        mediabox = page.rect
-        pix = page.get_pixmap()
-        
-        width = pix.width
-        height = pix.height
-        
-        left = width
-        right = 0
-        top = height
-        bottom = 0
-        
-        for y in range(height):
-            for x in range(width):
-                r, g, b = pix.pixel(x, y)
-                gray = (r + g + b) // 3
-                if gray < 255 * (1 - threshold):
-                    left = min(left, x)
-                    right = max(right, x)
-                    top = min(top, y)
-                    bottom = max(bottom, y)
-        
-        if left > right or top > bottom:
-            return mediabox
-        
-        x0 = mediabox.x0 + left * (mediabox.x1 - mediabox.x0) / width
-        y0 = mediabox.y0 + top * (mediabox.y1 - mediabox.y0) / height
-        x1 = mediabox.x0 + right * (mediabox.x1 - mediabox.x0) / width
-        y1 = mediabox.y0 + bottom * (mediabox.y1 - mediabox.y0) / height
-        
-        safety_margin = 15  # 磅
-        x0 = max(mediabox.x0, x0 - safety_margin)
-        x1 = min(mediabox.x1, x1 + safety_margin)
-        
-        if trim_vertical:
-            y0 = max(mediabox.y0, y0 - safety_margin)
-            y1 = min(mediabox.y1, y1 + safety_margin)
-        else:
-            # 不裁剪垂直方向，使用原始页面的上下边界
-            y0 = mediabox.y0
-            y1 = mediabox.y1
-            
-        return fitz.Rect(x0, y0, x1, y1)
-    
     def run(self):
         try:
-            doc = fitz.open(self.input_path)
-            output_doc = fitz.open()
-            
-            # 映射原页面到新页面的索引
-            page_mapping = {}
-            
-            total_pages = len(doc)
-            for i, page in enumerate(doc):
-                content_bbox = self.detect_content_bbox(page, trim_vertical=self.trim_vertical)
-                new_page = output_doc.new_page(width=content_bbox.width, height=content_bbox.height)
-                new_page.show_pdf_page(new_page.rect, doc, i, clip=content_bbox)
-                
-                # 保存页面映射关系（原页面索引 -> 新页面索引）
-                page_mapping[i] = new_page.number
-                
-                progress = int((i + 1) / total_pages * 100)
-                self.progress_updated.emit(progress)
-            
-            # 复制书签并调整目标页面
-            bookmarks = doc.get_toc()
-            if bookmarks:
-                new_bookmarks = []
-                for bm in bookmarks:
-                    level, title, page_num = bm[:3]
-                    # 页面索引从0开始
-                    if page_num - 1 in page_mapping:
-                        new_page_num = page_mapping[page_num - 1] + 1  # 转换为1-based索引
-                        new_bookmark = [level, title, new_page_num]
-                        # 添加可选的坐标信息（如果存在）
-                        if len(bm) > 3:
-                            new_bookmark.extend(bm[3:])
-                        new_bookmarks.append(new_bookmark)
-                # 设置新文档的书签
-                output_doc.set_toc(new_bookmarks)
-            
-            # 复制元数据
-            output_doc.set_metadata(doc.metadata)
-            
-            output_doc.save(self.output_path)
-            output_doc.close()
-            doc.close()
+            axis = AXIS_BOTH if self.trim_vertical else AXIS_HORIZONTAL
+            profiler = StageProfiler(trace=True) if self.profile else None
+            trim_pdf(self.input_path, self.output_path, self.options, safety_margin=15, axis=axis,
+                     progress_callback=self.progress.update, profiler=profiler)
             
             original_size = os.path.getsize(self.input_path)
             cropped_size = os.path.getsize(self.output_path)
             reduction = (1 - cropped_size / original_size) * 100
+            message = f"处理完成！文件大小减少: {reduction:.2f}%"
+            
+            if profiler is not None:
+                trace_path = os.path.splitext(self.output_path)[0] + "_trace.json"
+                profiler.write_chrome_trace(trace_path)
+                message += f"\n\n{profiler.format_summary()}\n\n跟踪文件已保存至: {trace_path}"
             
-            self.task_completed.emit(True, f"处理完成！文件大小减少: {reduction:.2f}%")
+            self.task_completed.emit(True, message)
         except Exception as e:
             self.task_completed.emit(False, f"处理失败: {str(e)}")
 
@@ -155,6 +84,31 @@ class PDFTrimmer(QMainWindow):
         self.trim_vertical_checkbox.setChecked(False)
         options_layout.addWidget(self.trim_vertical_checkbox)
         
+        # 抗噪参数：忽略扫描件上零星的灰尘污点
+        noise_layout = QHBoxLayout()
+        noise_layout.addWidget(QLabel("最小内容密度"))
+        self.min_density_spinbox = QDoubleSpinBox()
+        self.min_density_spinbox.setRange(0, 50)
+        self.min_density_spinbox.setDecimals(1)
+        self.min_density_spinbox.setSingleStep(0.5)
+        self.min_density_spinbox.setSuffix(" %")
+        self.min_density_spinbox.setToolTip("一行（列）中内容像素所占比例低于该值时视为噪点，0 表示不过滤")
+        noise_layout.addWidget(self.min_density_spinbox)
+        noise_layout.addWidget(QLabel("最小连续宽度"))
+        self.min_run_spinbox = QDoubleSpinBox()
+        self.min_run_spinbox.setRange(0, 36)
+        self.min_run_spinbox.setDecimals(1)
+        self.min_run_spinbox.setSingleStep(0.5)
+        self.min_run_spinbox.setSuffix(" 磅")
+        self.min_run_spinbox.setToolTip("内容至少连续该宽度才算作边界，0 表示不过滤")
+        noise_layout.addWidget(self.min_run_spinbox)
+        noise_layout.addStretch(1)
+        options_layout.addLayout(noise_layout)
+        
+        self.profile_checkbox = QCheckBox("统计各阶段耗时（同时保存 Chrome 跟踪文件）")
+        self.profile_checkbox.setChecked(False)
+        options_layout.addWidget(self.profile_checkbox)
+        
         main_layout.addWidget(options_group)
         
         # 处理按钮
@@ -175,6 +129,11 @@ class PDFTrimmer(QMainWindow):
         # 添加拉伸以调整布局
         main_layout.addStretch(1)
         
+        # 每秒刷新 10 次进度
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(100)
+        self.progress_timer.timeout.connect(self.update_progress)
+        
         self.show()
         
     def select_file(self):
@@ -201,17 +160,28 @@ class PDFTrimmer(QMainWindow):
         self.crop_thread = CropThread(
             self.file_path, 
             output_path, 
-            self.trim_vertical_checkbox.isChecked()
+            self.trim_vertical_checkbox.isChecked(),
+            self.profile_checkbox.isChecked(),
+            self.analysis_options()
         )
         
-        self.crop_thread.progress_updated.connect(self.update_progress)
         self.crop_thread.task_completed.connect(self.on_task_completed)
         self.crop_thread.start()
+        self.progress_timer.start()
+        
+    def analysis_options(self):
+        return AnalysisOptions(min_density=self.min_density_spinbox.value() / 100,
+                               min_run=self.min_run_spinbox.value())
         
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
+    def update_progress(self):
+        snapshot = self.crop_thread.progress.snapshot()
+        if snapshot.total:
+            self.progress_bar.setValue(snapshot.percent)
+            self.status_label.setText(f"处理中... {format_progress(snapshot)}")
         
     def on_task_completed(self, success, message):
+        self.progress_timer.stop()
+        self.update_progress()
         self.process_button.setEnabled(True)
         
         if success:
@@ -222,6 +192,7 @@ class PDFTrimmer(QMainWindow):
             QMessageBox.critical(self, "错误", message)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setStyle('Fusion')  # 使用Fusion风格，跨平台一致性更好
     window = PDFTrimmer()
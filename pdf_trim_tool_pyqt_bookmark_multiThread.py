@@ -1,150 +1,50 @@
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, 
                             QHBoxLayout, QFileDialog, QWidget, QCheckBox, QLabel, 
-                            QProgressBar, QMessageBox, QGroupBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QMutex
-import fitz
-from tqdm import tqdm
-import concurrent.futures
-from queue import Queue
-
-class PageProcessingThread(QThread):
-    page_processed = pyqtSignal(int, object)
-    
-    def __init__(self, input_doc, page_num, trim_horizontal):
-        super().__init__()
-        self.input_doc = input_doc
-        self.page_num = page_num
-        self.trim_horizontal = trim_horizontal
-        
-    def detect_content_bbox(self, page, threshold=0.1, trim_horizontal=True):
-        """检测页面内容的边界框"""
-        mediabox = page.rect
-        pix = page.get_pixmap()
-        
-        width = pix.width
-        height = pix.height
-        
-        left = width
-        right = 0
-        top = height
-        bottom = 0
-        
-        for y in range(height):
-            for x in range(width):
-                r, g, b = pix.pixel(x, y)
-                gray = (r + g + b) // 3
-                if gray < 255 * (1 - threshold):
-                    left = min(left, x)
-                    right = max(right, x)
-                    top = min(top, y)
-                    bottom = max(bottom, y)
-        
-        if left > right or top > bottom:
-            return mediabox
-        
-        x0 = mediabox.x0 + left * (mediabox.x1 - mediabox.x0) / width
-        y0 = mediabox.y0 + top * (mediabox.y1 - mediabox.y0) / height
-        x1 = mediabox.x0 + right * (mediabox.x1 - mediabox.x0) / width
-        y1 = mediabox.y0 + bottom * (mediabox.y1 - mediabox.y0) / height
-        
-        safety_margin = 10
-        y0 = max(mediabox.y0, y0 - safety_margin)
-        y1 = min(mediabox.y1, y1 + safety_margin)
-        
-        if trim_horizontal:
-            x0 = max(mediabox.x0, x0 - safety_margin)
-            x1 = min(mediabox.x1, x1 + safety_margin)
-        else:
-            x0 = mediabox.x0
-            x1 = mediabox.x1
-            
-        return fitz.Rect(x0, y0, x1, y1)
-    
-    def run(self):
-        page = self.input_doc.load_page(self.page_num)
-        content_bbox = self.detect_content_bbox(page, trim_horizontal=self.trim_horizontal)
-        self.page_processed.emit(self.page_num, content_bbox)
+                            QProgressBar, QMessageBox, QGroupBox, QDoubleSpinBox, QSpinBox)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+from pdf_trim_core import trim_pdf, default_workers, AnalysisOptions, AXIS_BOTH, AXIS_VERTICAL
+from pdf_trim_profile import StageProfiler
+from pdf_trim_progress import ProgressCounter, format_progress
 
 class CropThread(QThread):
-    progress_updated = pyqtSignal(int)
     task_completed = pyqtSignal(bool, str)
     
-    def __init__(self, input_path, output_path, trim_horizontal):
+    def __init__(self, input_path, output_path, trim_horizontal, workers=None, profile=False, options=None):
         super().__init__()
         self.input_path = input_path
         self.output_path = output_path
         self.trim_horizontal = trim_horizontal
-        self.mutex = QMutex()
-        self.processed_pages = {}
-        self.total_pages = 0
-        self.pages_done = 0
+        self.workers = workers
+        self.profile = profile
+        self.options = options
+        # 工作线程只写入计数器，界面定时读取，不为每块页面发送信号
+        self.progress = ProgressCounter()
         
     def run(self):
         try:
-            doc = fitz.open(self.input_path)
-            output_doc = fitz.open()
-            
-            self.total_pages = len(doc)
-            self.pages_done = 0
-            
-            # 创建并启动多个页面处理线程
-            threads = []
-            for i in range(self.total_pages):
-                thread = PageProcessingThread(doc, i, self.trim_horizontal)
-                thread.page_processed.connect(self.on_page_processed)
-                threads.append(thread)
-                thread.start()
-            
-            # 等待所有线程完成
-            for thread in threads:
-                thread.wait()
-            
-            # 按顺序添加处理好的页面到输出文档
-            page_mapping = {}
-            for i in range(self.total_pages):
-                content_bbox = self.processed_pages[i]
-                new_page = output_doc.new_page(width=content_bbox.width, height=content_bbox.height)
-                new_page.show_pdf_page(new_page.rect, doc, i, clip=content_bbox)
-                page_mapping[i] = new_page.number
-            
-            # 复制书签并调整目标页面
-            bookmarks = doc.get_toc()
-            if bookmarks:
-                new_bookmarks = []
-                for bm in bookmarks:
-                    level, title, page_num = bm[:3]
-                    if page_num - 1 in page_mapping:
-                        new_page_num = page_mapping[page_num - 1] + 1
-                        new_bookmark = [level, title, new_page_num]
-                        if len(bm) > 3:
-                            new_bookmark.extend(bm[3:])
-                        new_bookmarks.append(new_bookmark)
-                output_doc.set_toc(new_bookmarks)
-            
-            # 复制元数据
-            output_doc.set_metadata(doc.metadata)
-            
-            output_doc.save(self.output_path)
-            output_doc.close()
-            doc.close()
+            axis = AXIS_BOTH if self.trim_horizontal else AXIS_VERTICAL
+            profiler = StageProfiler(trace=True) if self.profile else None
+            # 多个工作进程分块分析页面，每页结果一到就按顺序输出
+            trim_pdf(self.input_path, self.output_path, self.options, safety_margin=10, axis=axis,
+                     workers=self.workers,
+                     progress_callback=self.progress.update, profiler=profiler)
             
             original_size = os.path.getsize(self.input_path)
             cropped_size = os.path.getsize(self.output_path)
             reduction = (1 - cropped_size / original_size) * 100
+            message = f"处理完成！文件大小减少: {reduction:.2f}%"
             
-            self.task_completed.emit(True, f"处理完成！文件大小减少: {reduction:.2f}%")
+            if profiler is not None:
+                trace_path = os.path.splitext(self.output_path)[0] + "_trace.json"
+                profiler.write_chrome_trace(trace_path)
+                message += f"\n\n{profiler.format_summary()}\n\n跟踪文件已保存至: {trace_path}"
+            
+            self.task_completed.emit(True, message)
         except Exception as e:
             self.task_completed.emit(False, f"处理失败: {str(e)}")
-    
-    def on_page_processed(self, page_num, content_bbox):
-        self.mutex.lock()
-        self.processed_pages[page_num] = content_bbox
-        self.pages_done += 1
-        progress = int(self.pages_done / self.total_pages * 100)
-        self.progress_updated.emit(progress)
-        self.mutex.unlock()
 
 class PDFTrimmer(QMainWindow):
     def __init__(self):
@@ -185,6 +85,40 @@ class PDFTrimmer(QMainWindow):
         self.trim_horizontal_checkbox.setChecked(False)
         options_layout.addWidget(self.trim_horizontal_checkbox)
         
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("工作进程数"))
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, max(64, default_workers()))
+        self.workers_spinbox.setValue(default_workers())
+        workers_layout.addWidget(self.workers_spinbox)
+        workers_layout.addStretch(1)
+        options_layout.addLayout(workers_layout)
+        
+        # 抗噪参数：忽略扫描件上零星的灰尘污点
+        noise_layout = QHBoxLayout()
+        noise_layout.addWidget(QLabel("最小内容密度"))
+        self.min_density_spinbox = QDoubleSpinBox()
+        self.min_density_spinbox.setRange(0, 50)
+        self.min_density_spinbox.setDecimals(1)
+        self.min_density_spinbox.setSingleStep(0.5)
+        self.min_density_spinbox.setSuffix(" %")
+        self.min_density_spinbox.setToolTip("一行（列）中内容像素所占比例低于该值时视为噪点，0 表示不过滤")
+        noise_layout.addWidget(self.min_density_spinbox)
+        noise_layout.addWidget(QLabel("最小连续宽度"))
+        self.min_run_spinbox = QDoubleSpinBox()
+        self.min_run_spinbox.setRange(0, 36)
+        self.min_run_spinbox.setDecimals(1)
+        self.min_run_spinbox.setSingleStep(0.5)
+        self.min_run_spinbox.setSuffix(" 磅")
+        self.min_run_spinbox.setToolTip("内容至少连续该宽度才算作边界，0 表示不过滤")
+        noise_layout.addWidget(self.min_run_spinbox)
+        noise_layout.addStretch(1)
+        options_layout.addLayout(noise_layout)
+        
+        self.profile_checkbox = QCheckBox("统计各阶段耗时（同时保存 Chrome 跟踪文件）")
+        self.profile_checkbox.setChecked(False)
+        options_layout.addWidget(self.profile_checkbox)
+        
         main_layout.addWidget(options_group)
         
         # 处理按钮
@@ -205,6 +139,11 @@ class PDFTrimmer(QMainWindow):
         # 添加拉伸以调整布局
         main_layout.addStretch(1)
         
+        # 每秒刷新 10 次进度
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(100)
+        self.progress_timer.timeout.connect(self.update_progress)
+        
         self.show()
         
     def select_file(self):
@@ -231,17 +170,29 @@ class PDFTrimmer(QMainWindow):
         self.crop_thread = CropThread(
             self.file_path, 
             output_path, 
-            self.trim_horizontal_checkbox.isChecked()
+            self.trim_horizontal_checkbox.isChecked(),
+            self.workers_spinbox.value(),
+            self.profile_checkbox.isChecked(),
+            self.analysis_options()
         )
         
-        self.crop_thread.progress_updated.connect(self.update_progress)
         self.crop_thread.task_completed.connect(self.on_task_completed)
         self.crop_thread.start()
+        self.progress_timer.start()
+        
+    def analysis_options(self):
+        return AnalysisOptions(min_density=self.min_density_spinbox.value() / 100,
+                               min_run=self.min_run_spinbox.value())
         
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
+    def update_progress(self):
+        snapshot = self.crop_thread.progress.snapshot()
+        if snapshot.total:
+            self.progress_bar.setValue(snapshot.percent)
+            self.status_label.setText(f"处理中... {format_progress(snapshot)}")
         
     def on_task_completed(self, success, message):
+        self.progress_timer.stop()
+        self.update_progress()
         self.process_button.setEnabled(True)
         
         if success:
@@ -252,6 +203,7 @@ class PDFTrimmer(QMainWindow):
             QMessageBox.critical(self, "错误", message)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setStyle('Fusion')  # 使用Fusion风格，跨平台一致性更好
     window = PDFTrimmer()
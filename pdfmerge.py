@@ -1,16 +1,20 @@
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QPushButton, QListWidget, QVBoxLayout,
     QFileDialog, QHBoxLayout, QMessageBox, QLabel, QComboBox,
-    QAction, QMenu,QListWidgetItem
+    QAction, QMenu,QListWidgetItem, QProgressBar
 )
-from PyQt5.QtCore import Qt
-from PyPDF2 import PdfReader, PdfWriter
+from PyQt5.QtCore import Qt, QTimer
 
 from PyQt5.QtWidgets import QShortcut
 from PyQt5.QtGui import QKeySequence
 
+from pdf_merge_core import SourceInspector
+from pdf_merge_thread import MergeThread, source_label, update_source_items, invalid_sources
+from pdf_trim_progress import format_progress
+
 
 class PDFMergerApp(QWidget):
     def __init__(self):
@@ -32,11 +36,18 @@ class PDFMergerApp(QWidget):
 
         self.add_button = QPushButton("添加 PDF 文件")
         self.merge_button = QPushButton("合并 PDF")
+        self.cancel_button = QPushButton("取消合并")
+        self.cancel_button.setEnabled(False)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        self.status_label = QLabel("就绪")
 
         # 布局
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.merge_button)
+        button_layout.addWidget(self.cancel_button)
 
         layout = QVBoxLayout()
         layout.addWidget(QLabel("选择排序方式："))
@@ -44,13 +55,28 @@ class PDFMergerApp(QWidget):
         layout.addWidget(QLabel("拖动可调整顺序（右键可移除）："))
         layout.addWidget(self.file_list)
         layout.addLayout(button_layout)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
 
         self.setLayout(layout)
 
         # 事件绑定
         self.add_button.clicked.connect(self.add_pdfs)
         self.merge_button.clicked.connect(self.merge_pdfs)
+        self.cancel_button.clicked.connect(self.cancel_merge)
+
+        # 合并时每秒刷新 10 次进度
+        self.merge_thread = None
+        self.current_file = ""
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(100)
+        self.progress_timer.timeout.connect(self.update_progress)
 
+        # 添加文件后在进程池中预先读取页数与书签，定时收集结果
+        self.inspector = SourceInspector()
+        self.inspect_timer = QTimer(self)
+        self.inspect_timer.setInterval(100)
+        self.inspect_timer.timeout.connect(self.update_source_info)
 
         # 添加 Ctrl+A 快捷键：全选
         self.shortcut_select_all = QShortcut(QKeySequence("Ctrl+A"), self)
@@ -115,103 +141,124 @@ class PDFMergerApp(QWidget):
         self.file_list.clear()
         for file in sorted_files:
             item = QListWidgetItem()
-            item.setText(os.path.basename(file))      # 显示文件名
+            item.setText(source_label(file, None))    # 显示文件名，读取后显示页数
             item.setData(Qt.UserRole, file)           # 存储完整路径
             item.setToolTip(file)                     # 鼠标悬停显示完整路径
             self.file_list.addItem(item)
 
+        self.inspector.submit(sorted_files)
+        update_source_items(self.file_list, self.inspector)
+        self.inspect_timer.start()
+
+    def update_source_info(self):
+        if self.inspector.poll():
+            update_source_items(self.file_list, self.inspector)
+        if not self.inspector.busy:
+            self.inspect_timer.stop()
+
     def merge_pdfs(self):
         if self.file_list.count() == 0:
             QMessageBox.warning(self, "错误", "请先添加至少一个 PDF 文件。")
             return
 
+        self.update_source_info()
+        invalid = invalid_sources(self.file_list, self.inspector)
+        if invalid:
+            QMessageBox.warning(self, "错误", "以下文件无法合并，请先移除：\n" + "\n".join(invalid))
+            return
+
         output_path, _ = QFileDialog.getSaveFileName(self, "保存合并后的 PDF", "", "PDF 文件 (*.pdf)")
         if not output_path:
             return
 
-        try:
-            pdf_writer = PdfWriter()
-            current_page = 0
-            bookmarks = []
-
-            for i in range(self.file_list.count()):
-                item = self.file_list.item(i)
-                pdf_path = item.data(Qt.UserRole)
-                reader = PdfReader(pdf_path)
-
-                # 获取书签
-                outlines = reader.outline if reader.outline else []
-                bookmarks.append({
-                    'filename': item.text(),
-                    'pages': len(reader.pages),
-                    'outline': outlines
-                })
-
-                # 添加页面
-                for page in reader.pages:
-                    pdf_writer.add_page(page)
-
-                # 记录当前插入位置
-                bookmarks[-1]['start_page'] = current_page
-                current_page += len(reader.pages)
-
-            # 写入页面后再添加书签
-            current_page = 0
-            for bm in bookmarks:
-                filename = bm['filename']
-                start_page = bm['start_page']
-
-                # 添加主书签（文件名）
-                top_level = pdf_writer.add_outline_item(filename, start_page)
-
-                # 添加原书签
-                self.add_outline(pdf_writer, bm['outline'], parent=top_level, offset=current_page)
-
-                current_page += bm['pages']
-
-            with open(output_path, "wb") as output_file:
-                pdf_writer.write(output_file)
-
-                    # 显示完成消息，并添加打开文件夹按钮
-            msg_box = QMessageBox(self)
-            msg_box.setIcon(QMessageBox.Information)
-            msg_box.setWindowTitle("完成")
-            msg_box.setText(f"PDF 已成功合并到：\n{output_path}")
-            # QMessageBox.information(self, "完成", f"PDF 已成功合并并添加书签到：\n{output_path}")
-            # 添加按钮
-            open_folder_button = msg_box.addButton("打开文件所在位置", QMessageBox.ActionRole)
-            ok_button = msg_box.addButton(QMessageBox.Ok)
-
-            msg_box.exec_()
-
-            if msg_box.clickedButton() == open_folder_button:
-                self.open_file_location(output_path)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"合并过程中出错：{str(e)}")
-
-    def add_outline(self, writer, outline, parent=None, offset=0):
-        """递归添加书签"""
-        if isinstance(outline, list):
-            for item in outline:
-                self.add_outline(writer, item, parent, offset)
-        elif hasattr(outline, 'dest'):
-            dest = outline.dest
-            page_number = writer.get_destination_page_number(dest) + offset
-            writer.add_outline_item(outline.title, page_number, parent=parent)
-        elif hasattr(outline, '__dict__'):
-            title = getattr(outline, 'title', 'Untitled')
-            try:
-                page_ref = getattr(outline, 'page_reference', None)
-                if page_ref:
-                    page_number = writer.page_references.index(page_ref) + offset
-                    writer.add_outline_item(title, page_number, parent=parent)
-                else:
-                    pass
-            except Exception:
-                pass
+        # 书签使用文件名，列表中显示的页数不计入；尚未读取完的文件在合并线程中读取
+        sources = []
+        for i in range(self.file_list.count()):
+            file = self.file_list.item(i).data(Qt.UserRole)
+            sources.append((file, os.path.basename(file)))
+
+        self.set_merging(True)
+        self.status_label.setText("合并中...")
+        self.progress_bar.setValue(0)
+        self.merge_thread = MergeThread(sources, output_path, dict(self.inspector.infos))
+        self.merge_thread.file_started.connect(self.on_file_started)
+        self.merge_thread.task_completed.connect(self.on_merge_completed)
+        self.merge_thread.start()
+        self.progress_timer.start()
+
+    def set_merging(self, merging):
+        self.add_button.setEnabled(not merging)
+        self.merge_button.setEnabled(not merging)
+        self.file_list.setEnabled(not merging)
+        self.cancel_button.setEnabled(merging)
+
+    def cancel_merge(self):
+        if self.merge_thread is not None and self.merge_thread.isRunning():
+            self.merge_thread.cancel()
+            self.cancel_button.setEnabled(False)
+            self.status_label.setText("正在取消...")
+
+    def on_file_started(self, index, count, pdf_path):
+        self.current_file = f"第 {index + 1}/{count} 个文件：{os.path.basename(pdf_path)}"
+
+    def update_progress(self):
+        if self.merge_thread is None or self.merge_thread.cancel_event.is_set():
+            return
+        snapshot = self.merge_thread.progress.snapshot()
+        if not snapshot.total:
+            self.status_label.setText(f"读取{self.current_file}")
+        elif snapshot.done < snapshot.total:
+            self.progress_bar.setValue(snapshot.percent)
+            self.status_label.setText(f"添加页面... {format_progress(snapshot)}（{self.current_file}）")
+        else:
+            self.progress_bar.setValue(100)
+            self.status_label.setText("写入文件...")
+
+    def on_merge_completed(self, success, message):
+        self.progress_timer.stop()
+        # 信号在 run() 返回前发出，等线程结束后再释放
+        self.merge_thread.wait()
+        output_path = self.merge_thread.output_path
+        cancelled = self.merge_thread.cancel_event.is_set()
+        self.merge_thread = None
+        self.set_merging(False)
+
+        if not success:
+            self.progress_bar.setValue(0)
+            self.status_label.setText("合并未完成")
+            if cancelled:
+                QMessageBox.information(self, "已取消", message)
+            else:
+                QMessageBox.critical(self, "错误", message)
+            return
+
+        self.status_label.setText("合并完成")
+        # 显示完成消息，并添加打开文件夹按钮
+        msg_box = QMessageBox(self)
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.setWindowTitle("完成")
+        msg_box.setText(message)
+        # 添加按钮
+        open_folder_button = msg_box.addButton("打开文件所在位置", QMessageBox.ActionRole)
+        ok_button = msg_box.addButton(QMessageBox.Ok)
+
+        msg_box.exec_()
+
+        if msg_box.clickedButton() == open_folder_button:
+            self.open_file_location(output_path)
+
+    def closeEvent(self, event):
+        # 关闭窗口时取消正在进行的合并并等待线程结束，临时文件由合并线程删除
+        if self.merge_thread is not None and self.merge_thread.isRunning():
+            self.merge_thread.cancel()
+            self.merge_thread.wait()
+        self.inspect_timer.stop()
+        self.inspector.shutdown()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = PDFMergerApp()
     window.show()